@@ -0,0 +1,46 @@
+from asgiref.sync import sync_to_async
+from django.db.models import QuerySet
+
+# Awaitable queryset helpers for the async views. Django 4.1+ ships native
+# async queryset methods (aget(), afirst(), async iteration ...) and these
+# defer to them; older versions run the same call through sync_to_async in
+# thread-sensitive mode. Under Django's ASGI handler each request then gets
+# its own sync thread (and database connection) for the whole request, not
+# one per call; outside a request the calls share the main thread.
+NATIVE = hasattr(QuerySet, 'aget')
+
+
+async def alist(queryset: QuerySet) -> list:
+    if NATIVE:
+        return [obj async for obj in queryset]
+    return await sync_to_async(list)(queryset)
+
+
+async def aget(queryset: QuerySet, **kwargs):
+    if NATIVE:
+        return await queryset.aget(**kwargs)
+    return await sync_to_async(queryset.get)(**kwargs)
+
+
+async def afirst(queryset: QuerySet):
+    if NATIVE:
+        return await queryset.afirst()
+    return await sync_to_async(queryset.first)()
+
+
+async def aexists(queryset: QuerySet) -> bool:
+    if NATIVE:
+        return await queryset.aexists()
+    return await sync_to_async(queryset.exists)()
+
+
+async def acount(queryset: QuerySet) -> int:
+    if NATIVE:
+        return await queryset.acount()
+    return await sync_to_async(queryset.count)()
+
+
+async def arun(func, *args, **kwargs):
+    # Writes go through serializers and signal handlers that are synchronous
+    # on every Django version, so they always run as one executor call.
+    return await sync_to_async(func)(*args, **kwargs)
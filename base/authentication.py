@@ -0,0 +1,115 @@
+from uuid import UUID
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTTokenUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from .aorm import afirst, arun
+from .metrics import AUTH, timing
+
+User = get_user_model()
+
+ACTIVE_STATUS_KEY = 'auth:active:{}'
+
+
+class ClaimUser(TokenUser):
+    """
+    Request principal built from the signed `user_id` claim; `id` is a UUID so
+    views can compare it with `owner_id` columns directly.
+    """
+
+    @cached_property
+    def id(self) -> UUID:
+        return UUID(str(self.token[api_settings.USER_ID_CLAIM]))
+
+
+def active_status_key(user_id) -> str:
+    return ACTIVE_STATUS_KEY.format(user_id)
+
+
+def forget_active_status(user_id) -> None:
+    cache.delete(active_status_key(user_id))
+
+
+def is_user_active(user_id: UUID) -> bool:
+    # Deleted or deactivated accounts must stop authenticating even though
+    # their tokens are still validly signed, so the flag is looked up at most
+    # once per JWT_ACTIVE_STATUS_TTL seconds per user.
+    ttl = getattr(settings, 'JWT_ACTIVE_STATUS_TTL', 0)
+    if ttl <= 0:
+        return True
+
+    key = active_status_key(user_id)
+    if (active := cache.get(key)) is None:
+        active = bool(User.objects.filter(pk=user_id).values_list('is_active', flat=True).first())
+        cache.set(key, active, ttl)
+    return active
+
+
+async def ais_user_active(user_id: UUID) -> bool:
+    ttl = getattr(settings, 'JWT_ACTIVE_STATUS_TTL', 0)
+    if ttl <= 0:
+        return True
+
+    key = active_status_key(user_id)
+    if (active := await cache.aget(key)) is None:
+        active = bool(await afirst(User.objects.filter(pk=user_id).values_list('is_active', flat=True)))
+        await cache.aset(key, active, ttl)
+    return active
+
+
+class AsyncJWTAuthenticationMixin:
+    def authenticate(self, request):
+        with timing(AUTH):
+            return super().authenticate(request)
+
+    async def aauthenticate(self, request):
+        # Same checks as authenticate(); signature validation is CPU only and
+        # the user lookup is awaited, so async views never block on it.
+        with timing(AUTH):
+            if (header := self.get_header(request)) is None:
+                return None
+            if (raw_token := self.get_raw_token(header)) is None:
+                return None
+            return await self.aget_user(self.get_validated_token(raw_token))
+
+
+class StatelessJWTAuthentication(AsyncJWTAuthenticationMixin, JWTTokenUserAuthentication):
+    def get_claim_user(self, validated_token) -> ClaimUser:
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = ClaimUser(validated_token)
+        try:
+            user.id
+        except ValueError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        return user
+
+    def get_user(self, validated_token):
+        user = self.get_claim_user(validated_token)
+        if not is_user_active(user.id):
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+    async def aget_user(self, validated_token) -> ClaimUser:
+        user = self.get_claim_user(validated_token)
+        if not await ais_user_active(user.id):
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+
+class DatabaseJWTAuthentication(AsyncJWTAuthenticationMixin, JWTAuthentication):
+    async def aget_user(self, validated_token):
+        return await arun(self.get_user, validated_token)
+
+
+def get_authentication():
+    # Follows JWT_AUTH_MODE like REST_FRAMEWORK's DEFAULT_AUTHENTICATION_CLASSES.
+    if getattr(settings, 'JWT_AUTH_MODE', 'stateless') == 'stateless':
+        return StatelessJWTAuthentication()
+    return DatabaseJWTAuthentication()
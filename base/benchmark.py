@@ -0,0 +1,243 @@
+import platform
+import random
+import statistics
+import subprocess
+import time
+import django
+import rest_framework
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime, timezone
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.test import Client, override_settings
+from .models import MyUser, Category, Note
+from .seed import SEED_PASSWORD
+from .tokens import access_token_for
+
+# In-process API benchmarks: requests go through the full middleware, view
+# and serializer stack via django.test.Client, with no network or server in
+# the measurement. Each scenario runs against both URL sets; the output is a
+# plain dict (written as JSON by the command) so runs can be diffed across
+# commits. Run it against a database filled by `manage.py seed_data`.
+# Scenarios that write run inside a transaction that is rolled back, so every
+# run sees the same dataset; their latencies leave out the final commit.
+URL_SETS = {
+    'func': ('base.urls', 'search'),
+    'cls': ('base.urls_cls', 'keyword'),
+}
+PAGE_SIZE = 50
+PERCENTILES = (50, 90, 95, 99)
+SEARCH_TERMS = ('meeting', 'coffee', 'deadline', 'report', 'recipe', 'release')
+NOTE_IDS_PER_USER = 200
+
+
+class Context:
+    def __init__(self, client: Client, rng: random.Random, users: list, note_ids: dict, search_param: str):
+        self.client = client
+        self.rng = rng
+        self.users = users
+        self.note_ids = note_ids
+        self.search_param = search_param
+        self.tokens = {user.pk: access_token_for(user.pk) for user in users}
+        # Seeded notes `note_delete` has not deleted yet in this transaction;
+        # filled on first use and never refilled, so no id is deleted twice.
+        self.deletable = None
+
+    def user(self):
+        return self.rng.choice(self.users)
+
+    def own_note(self):
+        # Users without notes fall back to one that has some.
+        user = self.rng.choice([user for user in self.users if self.note_ids[user.pk]] or self.users)
+        return user, self.rng.choice(self.note_ids[user.pk])
+
+    def take_note(self):
+        if self.deletable is None:
+            self.deletable = [(user, note_id) for user in self.users for note_id in self.note_ids[user.pk]]
+            self.rng.shuffle(self.deletable)
+        if not self.deletable:
+            raise ValueError('Every sampled note has been deleted; sample more users or send fewer requests.')
+        return self.deletable.pop()
+
+    @contextmanager
+    def rolled_back(self):
+        with transaction.atomic():
+            yield
+            transaction.set_rollback(True)
+        self.deletable = None
+
+    def request(self, method: str, path: str, user=None, data=None):
+        extra = {'HTTP_AUTHORIZATION': f'Bearer {self.tokens[user.pk]}'} if user is not None else {}
+        return getattr(self.client, method)(path, data, content_type='application/json', **extra)
+
+
+def _note_payload(rng: random.Random) -> dict:
+    return {'title': f'Benchmark {rng.randrange(10 ** 6)}', 'body': 'benchmark body ' * rng.randint(1, 40)}
+
+
+def login(ctx: Context):
+    user = ctx.user()
+    return ctx.request('post', '/api/token/login', data={'email': user.email, 'password': SEED_PASSWORD})
+
+
+def note_list(ctx: Context):
+    return ctx.request('get', '/api/notes', ctx.user())
+
+
+def note_list_offset(ctx: Context):
+    return ctx.request('get', f'/api/notes?limit={PAGE_SIZE}&offset={ctx.rng.randrange(0, 500, PAGE_SIZE)}', ctx.user())
+
+
+def note_list_cursor(ctx: Context):
+    return ctx.request('get', f'/api/notes?pagination=cursor&limit={PAGE_SIZE}', ctx.user())
+
+
+def note_search(ctx: Context):
+    return ctx.request('get', f'/api/notes?{ctx.search_param}={ctx.rng.choice(SEARCH_TERMS)}', ctx.user())
+
+
+def note_create(ctx: Context):
+    return ctx.request('post', '/api/notes', ctx.user(), _note_payload(ctx.rng))
+
+
+def note_retrieve(ctx: Context):
+    user, note_id = ctx.own_note()
+    return ctx.request('get', f'/api/notes/{note_id}', user)
+
+
+def note_update(ctx: Context):
+    user, note_id = ctx.own_note()
+    return ctx.request('put', f'/api/notes/{note_id}', user, _note_payload(ctx.rng))
+
+
+def note_delete(ctx: Context):
+    user, note_id = ctx.take_note()
+    return ctx.request('delete', f'/api/notes/{note_id}', user)
+
+
+def category_list(ctx: Context):
+    return ctx.request('get', '/api/categories', ctx.user())
+
+
+SCENARIOS = {
+    scenario.__name__: scenario
+    for scenario in (
+        login, note_list, note_list_offset, note_list_cursor, note_search,
+        note_create, note_retrieve, note_update, note_delete, category_list,
+    )
+}
+WRITE_SCENARIOS = (note_create, note_update, note_delete)
+
+
+def _summary(values: list, scale: float = 1) -> dict:
+    values = [value * scale for value in values]
+    if len(values) > 1:
+        cuts = statistics.quantiles(values, n=100, method='inclusive')
+        percentiles = {f'p{p}': cuts[p - 1] for p in PERCENTILES}
+    else:
+        percentiles = {f'p{p}': values[0] for p in PERCENTILES}
+    return {
+        **percentiles,
+        'mean': statistics.fmean(values),
+        'min': min(values),
+        'max': max(values),
+    }
+
+
+def run_scenario(ctx: Context, scenario, requests: int, warmup: int) -> dict:
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    for _ in range(warmup):
+        scenario(ctx)
+
+    latencies, query_counts, errors = [], [], 0
+    with ExitStack() as stack:
+        # Every alias, so reads routed to replicas are counted too.
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(count_queries))
+        started = time.perf_counter()
+        for _ in range(requests):
+            queries = 0
+            begin = time.perf_counter()
+            response = scenario(ctx)
+            latencies.append(time.perf_counter() - begin)
+            query_counts.append(queries)
+            errors += response.status_code >= 400
+        elapsed = time.perf_counter() - started
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': requests / elapsed if elapsed else None,
+        'latency_ms': _summary(latencies, 1000),
+        'queries': {'mean': statistics.fmean(query_counts), 'max': max(query_counts)},
+    }
+
+
+def sample_users(rng: random.Random, prefix: str, count: int) -> list:
+    users = list(MyUser.objects.filter(username__startswith=prefix).order_by('username'))
+    if not users:
+        raise ValueError(f'No users named "{prefix}*"; run `manage.py seed_data` first.')
+    return rng.sample(users, min(count, len(users)))
+
+
+def note_ids_for(users: list) -> dict:
+    return {
+        user.pk: list(Note.objects.filter(owner=user).values_list('id', flat=True)[:NOTE_IDS_PER_USER])
+        for user in users
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+                ('git', 'rev-parse', 'HEAD'), cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(seed_value: int, users: int) -> dict:
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'rest_framework': rest_framework.VERSION,
+        'database': connection.vendor,
+        'seed': seed_value,
+        'sampled_users': users,
+        'dataset': {
+            'users': MyUser.objects.count(),
+            'notes': Note.objects.count(),
+            'categories': Category.objects.count(),
+        },
+    }
+
+
+def run(scenarios=None, url_sets=None, requests: int = 200, warmup: int = 10, seed_value: int = 42,
+        prefix: str = 'bench', users: int = 50, response_cache: bool = False) -> dict:
+    rng = random.Random(seed_value)
+    sampled = sample_users(rng, prefix, users)
+    note_ids = note_ids_for(sampled)
+    overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+    if not response_cache:
+        overrides['RESPONSE_CACHE_TIMEOUT'] = 0
+
+    results = []
+    for url_set in url_sets or URL_SETS:
+        urlconf, search_param = URL_SETS[url_set]
+        with override_settings(ROOT_URLCONF=urlconf, **overrides):
+            # Every URL set replays the same request sequence.
+            ctx = Context(Client(), random.Random(seed_value), sampled, note_ids, search_param)
+            for name in scenarios or SCENARIOS:
+                scenario = SCENARIOS[name]
+                with ctx.rolled_back() if scenario in WRITE_SCENARIOS else nullcontext():
+                    result = run_scenario(ctx, scenario, requests, warmup)
+                results.append({'urls': url_set, 'scenario': name, **result})
+    return {'meta': metadata(seed_value, len(sampled)), 'results': results}
@@ -0,0 +1,191 @@
+from uuid import UUID
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from .models import Note, Category
+from .serializers import NoteSerializer
+from .signals import notes_bulk_saved
+
+# Batch create/update/delete/pin/move for notes. Every operation in a payload
+# runs inside one transaction; invalid items are reported per item and skipped
+# instead of failing the whole batch, which suits offline-sync clients.
+BULK_MAX_ITEMS = 1000
+ID_OPERATIONS = ('delete', 'pin', 'unpin')
+
+
+def _as_list(payload: dict, key: str) -> list:
+    value = payload.get(key, [])
+    if not isinstance(value, list):
+        raise serializers.ValidationError({key: 'Expected a list.'})
+    return value
+
+
+def _parse_id(value) -> UUID | None:
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _parse_ids(values: list) -> tuple:
+    parsed = [(value, _parse_id(value)) for value in values]
+    return parsed, {note_id for _, note_id in parsed if note_id is not None}
+
+
+def _owned_notes(owner_id: UUID, ids) -> dict:
+    return Note.objects.filter(owner_id=owner_id, pk__in=ids).in_bulk()
+
+
+def create_notes(owner_id: UUID, items: list) -> tuple:
+    serializer = NoteSerializer(context={'owner_id': owner_id})
+    results, notes = [], []
+    for item in items:
+        try:
+            note = Note(owner_id=owner_id, **serializer.run_validation(item))
+        except serializers.ValidationError as exc:
+            results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': exc.detail})
+            continue
+        results.append({'status': status.HTTP_201_CREATED, 'note': note})
+        notes.append(note)
+
+    Note.objects.bulk_create(notes)
+    return results, notes
+
+
+def update_notes(owner_id: UUID, items: list) -> tuple:
+    parsed, ids = _parse_ids([item.get('id') if isinstance(item, dict) else None for item in items])
+    existing = _owned_notes(owner_id, ids)
+    results, notes, fields = [], {}, set()
+    for item, (raw_id, note_id) in zip(items, parsed):
+        if note_id is None:
+            results.append({'id': raw_id, 'status': status.HTTP_400_BAD_REQUEST,
+                            'errors': {'id': 'A valid note id is required.'}})
+            continue
+        if (note := existing.get(note_id)) is None:
+            results.append({'id': raw_id, 'status': status.HTTP_404_NOT_FOUND})
+            continue
+        serializer = NoteSerializer(note, data=item, partial=True)
+        if not serializer.is_valid():
+            results.append({'id': raw_id, 'status': status.HTTP_400_BAD_REQUEST,
+                            'errors': serializer.errors})
+            continue
+        for attr, value in serializer.validated_data.items():
+            setattr(note, attr, value)
+        fields.update(serializer.validated_data)
+        notes[note.pk] = note
+        results.append({'id': raw_id, 'status': status.HTTP_200_OK, 'note': note})
+
+    return results, _save(list(notes.values()), fields), fields
+
+
+def set_note_fields(owner_id: UUID, values: list, **changes) -> tuple:
+    parsed, ids = _parse_ids(values)
+    existing = _owned_notes(owner_id, ids)
+    for note in existing.values():
+        for attr, value in changes.items():
+            setattr(note, attr, value)
+    results = [
+        {'id': raw_id, 'status': status.HTTP_200_OK if note_id in existing else status.HTTP_404_NOT_FOUND}
+        for raw_id, note_id in parsed
+    ]
+    fields = {Note._meta.get_field(attr).name for attr in changes}
+    return results, _save(list(existing.values()), fields), fields
+
+
+def delete_notes(owner_id: UUID, values: list) -> tuple:
+    parsed, ids = _parse_ids(values)
+    existing = set(Note.objects.filter(owner_id=owner_id, pk__in=ids).values_list('pk', flat=True))
+    # Regular queryset deletion keeps the per-note post_delete handlers firing.
+    Note.objects.filter(pk__in=existing).delete()
+    results = [
+        {'id': raw_id, 'status': status.HTTP_204_NO_CONTENT if note_id in existing else status.HTTP_404_NOT_FOUND}
+        for raw_id, note_id in parsed
+    ]
+    return results, existing
+
+
+def _save(notes: list, fields: set) -> list:
+    if notes and fields:
+        # bulk_update() skips auto_now, so updated_at is stamped here.
+        now = timezone.now()
+        for note in notes:
+            note.updated_at = now
+        Note.objects.bulk_update(notes, [*fields, 'updated_at'])
+    return notes
+
+
+def _move_target(owner_id: UUID, move: dict):
+    # Uncategorizing has to be asked for with an explicit null.
+    if 'category' not in move:
+        raise serializers.ValidationError({'category': 'This field is required; use null to clear it.'})
+    if (category := move['category']) is None:
+        return None
+    if (category_id := _parse_id(category)) is None \
+            or not Category.objects.filter(pk=category_id, owner_id=owner_id).exists():
+        raise serializers.ValidationError({'category': 'Unknown category.'})
+    return category_id
+
+
+def move_notes(owner_id: UUID, move: dict, values: list) -> tuple:
+    try:
+        category_id = _move_target(owner_id, move)
+    except serializers.ValidationError as exc:
+        results = [{'id': value, 'status': status.HTTP_400_BAD_REQUEST, 'errors': exc.detail} for value in values]
+        return results, [], set()
+    return set_note_fields(owner_id, values, category_id=category_id)
+
+
+def apply(owner_id: UUID, payload) -> dict:
+    if not isinstance(payload, dict):
+        raise serializers.ValidationError({'detail': 'Expected an object of bulk operations.'})
+
+    create = _as_list(payload, 'create')
+    update = _as_list(payload, 'update')
+    id_lists = {key: _as_list(payload, key) for key in ID_OPERATIONS}
+    move = payload.get('move') or {}
+    if not isinstance(move, dict):
+        raise serializers.ValidationError({'move': 'Expected an object.'})
+    move_ids = _as_list(move, 'notes')
+
+    total = len(create) + len(update) + len(move_ids) + sum(map(len, id_lists.values()))
+    if total > BULK_MAX_ITEMS:
+        raise serializers.ValidationError({'detail': f'At most {BULK_MAX_ITEMS} items per request.'})
+
+    results = {}
+    with transaction.atomic():
+        created, updated, fields = [], {}, set()
+
+        def track(notes: list, changed: set):
+            for note in notes:
+                updated[note.pk] = note
+            fields.update(changed)
+
+        if create:
+            results['create'], created = create_notes(owner_id, create)
+        if update:
+            results['update'], notes, changed = update_notes(owner_id, update)
+            track(notes, changed)
+        if move:
+            results['move'], notes, changed = move_notes(owner_id, move, move_ids)
+            track(notes, changed)
+        for key, pinned in (('pin', True), ('unpin', False)):
+            if key in payload:
+                results[key], notes, changed = set_note_fields(owner_id, id_lists[key], is_pinned=pinned)
+                track(notes, changed)
+        if 'delete' in payload:
+            results['delete'], deleted = delete_notes(owner_id, id_lists['delete'])
+            updated = {pk: note for pk, note in updated.items() if pk not in deleted}
+
+        notes_bulk_saved.send(
+                sender=Note,
+                owner_id=owner_id,
+                created=created,
+                updated=list(updated.values()),
+                update_fields=fields,
+        )
+
+    for items in results.values():
+        for item in items:
+            if note := item.pop('note', None):
+                item['data'] = NoteSerializer(note).data
+    return results
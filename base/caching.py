@@ -0,0 +1,111 @@
+import time
+from functools import wraps
+from hashlib import md5
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+# Per-user response cache for the list endpoints. Keys embed a version counter
+# per (user, scope); a write bumps the counter, which orphans every cached
+# response of that scope at once instead of searching for keys to delete.
+# The counters must be seen by every worker, so the cache is off on a
+# per-process LocMemCache unless RESPONSE_CACHE_SINGLE_PROCESS says there is
+# only one process.
+NOTES = 'notes'
+CATEGORIES = 'categories'
+VERSION_KEY = 'resp:version:{}:{}'
+RESPONSE_KEY = 'resp:{}:{}:{}'
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def get_timeout() -> int:
+    if isinstance(get_cache(), LocMemCache) and not getattr(settings, 'RESPONSE_CACHE_SINGLE_PROCESS', False):
+        return 0
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def _new_version() -> int:
+    # Time based, so a counter that was evicted never restarts at a value an
+    # older, still cached response was stored under.
+    return time.time_ns()
+
+
+def scope_versions(cache, owner_id, scopes) -> list:
+    keys = [VERSION_KEY.format(owner_id, scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate(owner_id, *scopes) -> None:
+    cache = get_cache()
+    for scope in scopes:
+        key = VERSION_KEY.format(owner_id, scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _new_version(), None)
+
+
+def response_key(cache, request, scopes) -> str:
+    versions = scope_versions(cache, request.user.id, scopes)
+    match = request.resolver_match
+    variant = '|'.join((
+        match.view_name if match else '',
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+    ))
+    return RESPONSE_KEY.format(
+            request.user.id,
+            '.'.join(map(str, versions)),
+            md5(variant.encode()).hexdigest()
+    )
+
+
+def cached_response(request, scopes, view):
+    timeout = get_timeout()
+    if request.method != 'GET' or timeout <= 0:
+        return view()
+
+    cache = get_cache()
+    key = response_key(cache, request, scopes)
+    if (entry := cache.get(key)) is not None:
+        data, headers = entry
+        response = get_conditional_response(request, etag=headers.get('ETag'))
+        if response is None:
+            response = Response(data)
+        for header, value in headers.items():
+            response.headers[header] = value
+        return response
+
+    response = view()
+    if response.status_code == 200 and not response.streaming and getattr(response, 'data', None) is not None:
+        headers = {header: response.headers[header] for header in CACHED_HEADERS if header in response.headers}
+        cache.set(key, (response.data, headers), timeout)
+    return response
+
+
+def cache_response(*scopes):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return cached_response(request, scopes, lambda: view(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+class CachedListMixin:
+    cache_scopes = ()
+
+    def list(self, request, *args, **kwargs):
+        view = super().list
+        return cached_response(request, self.cache_scopes, lambda: view(request, *args, **kwargs))
@@ -0,0 +1,81 @@
+from hashlib import md5
+from uuid import UUID
+from django.db.models import Count, Max
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+from .models import Note, Category, Tombstone
+
+TOMBSTONE_KINDS = {
+    Note: Tombstone.NOTE,
+    Category: Tombstone.CATEGORY,
+}
+
+
+def _etag(request, *parts) -> str:
+    # The representation also depends on the query string and negotiated format.
+    parts = (request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), *parts)
+    return '"%s"' % md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def object_validators(request, obj) -> tuple:
+    return _etag(request, obj.pk, obj.updated_at.isoformat()), obj.updated_at
+
+
+def collection_validators(request, owner_id: UUID, *models) -> tuple:
+    # Max(updated_at) catches edits, the row count and the latest tombstone
+    # catch deletions; all three come from the owner-scoped indexes.
+    parts, stamps = [], []
+    for model in models:
+        stats = model.objects.filter(owner_id=owner_id).aggregate(last=Max('updated_at'), count=Count('*'))
+        parts += [stats['count'], stats['last']]
+        stamps.append(stats['last'])
+
+    kinds = [TOMBSTONE_KINDS[model] for model in models if model in TOMBSTONE_KINDS]
+    if kinds:
+        deleted = Tombstone.objects.filter(owner_id=owner_id, kind__in=kinds).aggregate(last=Max('deleted_at'))
+        parts.append(deleted['last'])
+        stamps.append(deleted['last'])
+
+    last_modified = max((stamp for stamp in stamps if stamp is not None), default=None)
+    return _etag(request, *parts), last_modified
+
+
+def not_modified(request, etag: str, last_modified) -> HttpResponseBase | None:
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    # Only the ETag decides: Last-Modified has one-second resolution, so an
+    # edit within the same second would still match If-Modified-Since.
+    if (response := get_conditional_response(request, etag=etag)) is not None:
+        with_validators(response, etag, last_modified)
+    return response
+
+
+def with_validators(response: HttpResponseBase, etag: str, last_modified) -> HttpResponseBase:
+    if response.status_code in (200, 304):
+        response.headers['ETag'] = etag
+        if last_modified:
+            response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match on list and retrieve before serializing.
+    """
+    validator_models = ()
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        validators = object_validators(request, instance)
+        if response := not_modified(request, *validators):
+            return response
+        serializer = self.get_serializer(instance)
+        return with_validators(Response(serializer.data), *validators)
+
+    def list(self, request, *args, **kwargs):
+        validators = collection_validators(request, request.user.id, *self.validator_models)
+        if response := not_modified(request, *validators):
+            return response
+        return with_validators(super().list(request, *args, **kwargs), *validators)
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from functools import lru_cache, partial
+from uuid import UUID
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from .renderers import FastJSONRenderer
+from .streaming import is_asgi
+
+# Per-user change feed. Signal handlers publish small events (type + ids)
+# after commit; long-poll and SSE clients wait on a subscription and refetch
+# through the sync endpoint. The default broker only fans out inside one
+# process; EVENT_BROKER can name any class with the same interface.
+# SSE is WSGI-only: the stream blocks between events and Django's ASGI handler
+# iterates streaming responses on the event loop. ASGI clients long-poll.
+NOTE_SAVED = 'note.saved'
+NOTE_DELETED = 'note.deleted'
+CATEGORY_SAVED = 'category.saved'
+CATEGORY_DELETED = 'category.deleted'
+RESET = 'reset'
+
+EVENT_STREAM_CONTENT_TYPE = 'text/event-stream'
+AFTER_QUERY_PARAM = 'after'
+TIMEOUT_QUERY_PARAM = 'timeout'
+SSE_RETRY_MS = 3000
+
+
+def _next_id(last_id: int) -> int:
+    # Microsecond timestamps, so ids keep growing across process restarts and
+    # a cursor from an earlier process is recognised as stale.
+    return max(last_id + 1, time.time_ns() // 1000)
+
+
+class Subscription:
+    """
+    Buffered events for one waiting client; filled from any thread and
+    drained by a blocking (WSGI) or awaiting (ASGI) reader.
+    """
+
+    def __init__(self, owner_id: UUID, maxlen: int):
+        self.owner_id = owner_id
+        self.events = deque(maxlen=maxlen)
+        self._ready = threading.Event()
+        self._loop = None
+        self._async_ready = None
+
+    def push(self, event: dict) -> None:
+        self.events.append(event)
+        self._ready.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._async_ready.set)
+
+    def drain(self) -> list:
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    def wait(self, timeout: float) -> list:
+        if not self.events:
+            self._ready.wait(timeout)
+        self._ready.clear()
+        return self.drain()
+
+    async def await_events(self, timeout: float) -> list:
+        self._async_ready = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        if not self.events:
+            try:
+                await asyncio.wait_for(self._async_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.drain()
+
+
+class LocalBroker:
+    """
+    In-process fan-out with a short replay buffer per user, so reconnecting
+    clients resume from their last event id. Events only reach clients
+    connected to the same worker process.
+    """
+
+    def __init__(self):
+        self.backlog = getattr(settings, 'EVENT_BACKLOG', 100)
+        self.max_owners = getattr(settings, 'EVENT_MAX_OWNERS', 10000)
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._recent = OrderedDict()
+        # Per user, the newest event id that can no longer be replayed.
+        self._floor = {}
+        self.last_id = _next_id(0)
+        self._evicted = self.last_id
+
+    def publish(self, owner_id: UUID, event_type: str, ids) -> dict:
+        with self._lock:
+            self.last_id = _next_id(self.last_id)
+            event = {
+                'id': self.last_id,
+                'type': event_type,
+                'ids': [str(pk) for pk in ids],
+                'at': timezone.now().isoformat().replace('+00:00', 'Z'),
+            }
+            if (recent := self._recent.pop(owner_id, None)) is None:
+                recent = deque(maxlen=self.backlog)
+                self._floor[owner_id] = self._evicted
+            elif len(recent) == recent.maxlen:
+                self._floor[owner_id] = recent[0]['id']
+            recent.append(event)
+            self._recent[owner_id] = recent
+            while len(self._recent) > self.max_owners:
+                evicted_owner, evicted = self._recent.popitem(last=False)
+                self._floor.pop(evicted_owner, None)
+                self._evicted = max(self._evicted, evicted[-1]['id'])
+            subscribers = list(self._subscribers.get(owner_id, ()))
+
+        for subscription in subscribers:
+            subscription.push(event)
+        return event
+
+    def subscribe(self, owner_id: UUID) -> Subscription:
+        subscription = Subscription(owner_id, self.backlog)
+        with self._lock:
+            self._subscribers[owner_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.owner_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.owner_id, None)
+
+    def replay(self, owner_id: UUID, after: int) -> tuple:
+        # Returns (events, complete); incomplete means events were lost and
+        # the client has to resync.
+        with self._lock:
+            floor = self._floor.get(owner_id, self._evicted)
+            events = [event for event in self._recent.get(owner_id, ()) if event['id'] > after]
+        return events, after >= floor
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'EVENT_BROKER', 'base.events.LocalBroker'))()
+
+
+def publish(owner_id: UUID, event_type: str, ids) -> None:
+    if ids := list(ids):
+        get_broker().publish(owner_id, event_type, ids)
+
+
+def publish_on_commit(owner_id: UUID, event_type: str, ids) -> None:
+    transaction.on_commit(partial(publish, owner_id, event_type, list(ids)))
+
+
+def parse_poll(params) -> tuple:
+    max_timeout = getattr(settings, 'EVENT_POLL_TIMEOUT', 25)
+    try:
+        after = int(value) if (value := params.get(AFTER_QUERY_PARAM)) else None
+    except ValueError:
+        raise serializers.ValidationError({AFTER_QUERY_PARAM: 'Expected an event id.'})
+    try:
+        timeout = float(params.get(TIMEOUT_QUERY_PARAM, max_timeout))
+    except ValueError:
+        raise serializers.ValidationError({TIMEOUT_QUERY_PARAM: 'Expected a number of seconds.'})
+    return after, min(max(timeout, 0.0), max_timeout)
+
+
+def _replay(broker, owner_id: UUID, after: int | None) -> tuple:
+    if after is None:
+        return [], False
+    events, complete = broker.replay(owner_id, after)
+    return events, not complete
+
+
+def _poll_result(broker, after: int | None, events: list, reset: bool) -> dict:
+    if after is not None:
+        events = [event for event in events if event['id'] > after]
+    if events:
+        last_id = events[-1]['id']
+    else:
+        last_id = broker.last_id if after is None or reset else after
+    return {'last_event_id': last_id, 'reset': reset, 'events': events}
+
+
+def poll(owner_id: UUID, after: int | None, timeout: float) -> dict:
+    broker = get_broker()
+    # Subscribe before replaying so nothing published in between is missed.
+    subscription = broker.subscribe(owner_id)
+    try:
+        events, reset = _replay(broker, owner_id, after)
+        if not events and not reset and timeout > 0:
+            events = subscription.wait(timeout)
+    finally:
+        broker.unsubscribe(subscription)
+    return _poll_result(broker, after, events, reset)
+
+
+async def apoll(owner_id: UUID, after: int | None, timeout: float) -> dict:
+    broker = get_broker()
+    subscription = broker.subscribe(owner_id)
+    try:
+        events, reset = _replay(broker, owner_id, after)
+        if not events and not reset and timeout > 0:
+            events = await subscription.await_events(timeout)
+    finally:
+        broker.unsubscribe(subscription)
+    return _poll_result(broker, after, events, reset)
+
+
+def _sse(event: dict) -> str:
+    data = json.dumps(event, separators=(',', ':'))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+def stream(owner_id: UUID, last_event_id: int | None):
+    # Holds one worker thread per client; the connection is closed after
+    # EVENT_STREAM_MAX_AGE and the client reconnects with Last-Event-ID.
+    heartbeat = getattr(settings, 'EVENT_HEARTBEAT', 15)
+    deadline = time.monotonic() + getattr(settings, 'EVENT_STREAM_MAX_AGE', 300)
+    broker = get_broker()
+    subscription = broker.subscribe(owner_id)
+    try:
+        yield f'retry: {SSE_RETRY_MS}\n\n'
+        events, reset = _replay(broker, owner_id, last_event_id)
+        if reset:
+            yield _sse({'id': broker.last_id, 'type': RESET, 'ids': []})
+        last_id = last_event_id or 0
+        while True:
+            if events := [event for event in events if event['id'] > last_id]:
+                last_id = events[-1]['id']
+                yield ''.join(map(_sse, events))
+            if (remaining := deadline - time.monotonic()) <= 0:
+                break
+            if not (events := subscription.wait(min(heartbeat, remaining))):
+                yield ': keepalive\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+class EventStreamRenderer(FastJSONRenderer):
+    """
+    Lets `Accept: text/event-stream` clients through content negotiation; only
+    error responses are rendered, events themselves are streamed.
+    """
+    media_type = EVENT_STREAM_CONTENT_TYPE
+    format = 'sse'
+
+
+def stream_response(request) -> StreamingHttpResponse:
+    if is_asgi(request):
+        raise serializers.ValidationError({'detail': 'Server-sent events are only available under WSGI; '
+                                                     'long-poll the events endpoint instead.'})
+    after, _ = parse_poll(request.query_params)
+    if last_event_id := request.headers.get('Last-Event-ID'):
+        after, _ = parse_poll({AFTER_QUERY_PARAM: last_event_id})
+    response = StreamingHttpResponse(stream(request.user.id, after), content_type=EVENT_STREAM_CONTENT_TYPE)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stops nginx from buffering the stream.
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,41 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from base.benchmark import SCENARIOS, URL_SETS, run
+
+
+class Command(BaseCommand):
+    help = 'Runs the API scenario benchmarks in-process and prints the results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=tuple(SCENARIOS), dest='scenarios')
+        parser.add_argument('--urls', action='append', choices=tuple(URL_SETS), dest='url_sets')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='bench', help='Username prefix used by seed_data.')
+        parser.add_argument('--users', type=int, default=50, help='Number of seeded users to sample.')
+        parser.add_argument('--response-cache', action='store_true', help='Keep the response cache enabled.')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            results = run(
+                    scenarios=options['scenarios'],
+                    url_sets=options['url_sets'],
+                    requests=options['requests'],
+                    warmup=options['warmup'],
+                    seed_value=options['seed'],
+                    prefix=options['prefix'],
+                    users=options['users'],
+                    response_cache=options['response_cache'],
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        content = json.dumps(results, indent=2)
+        if output := options['output']:
+            with open(output, 'w') as file:
+                file.write(content + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Wrote {len(results["results"])} results to {output}.'))
+        else:
+            self.stdout.write(content)
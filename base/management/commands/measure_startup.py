@@ -0,0 +1,38 @@
+import json
+import os
+from subprocess import CalledProcessError
+from django.core.management.base import BaseCommand, CommandError
+from base.startup import PHASES, run
+
+
+class Command(BaseCommand):
+    help = 'Measures worker boot time (settings, app setup, middleware, URLs, first request) per settings module.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+                '--settings-module', action='append', dest='settings_modules',
+                help='Settings module to measure; repeat to compare. Defaults to the current and API-only settings.'
+        )
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        modules = options['settings_modules'] or list(dict.fromkeys(
+                (os.environ.get('DJANGO_SETTINGS_MODULE', 'not_api.settings'), 'not_api.settings_api')
+        ))
+        try:
+            results = run(modules, options['runs'])
+        except CalledProcessError as exc:
+            raise CommandError(f'Startup probe failed:\n{exc.stderr}')
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for module, result in results.items():
+            timings = ', '.join(f'{phase} {result["median_ms"][phase]:.1f}' for phase in (*PHASES, 'process'))
+            self.stdout.write(
+                    f'{module}: {timings} ms (median of {result["runs"]}, '
+                    f'{result["modules"]} modules, probe status {result["status"]})'
+            )
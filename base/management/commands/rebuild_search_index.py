@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from base.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for notes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        total = rebuild_index(options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} notes.'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from base.seed import seed
+
+
+class Command(BaseCommand):
+    help = 'Generates a reproducible synthetic dataset of users, categories and notes for benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--notes', type=int, default=100000)
+        parser.add_argument('--categories-per-user', type=int, default=5)
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent for notes per user.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='bench', help='Username prefix; must not be in use yet.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        def progress(created):
+            self.stdout.write(f'{created}/{options["notes"]} notes')
+
+        totals = seed(
+                options['users'],
+                options['notes'],
+                categories_per_user=options['categories_per_user'],
+                skew=options['skew'],
+                seed_value=options['seed'],
+                prefix=options['prefix'],
+                batch_size=options['batch_size'],
+                progress=progress if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+                f'Created {totals["users"]} users, {totals["categories"]} categories and {totals["notes"]} notes.'
+        ))
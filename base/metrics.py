@@ -0,0 +1,216 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.http import HttpResponse
+
+# Per-request timings (auth, db, serialize, render) collected while a request
+# runs, reported in a Server-Timing header and aggregated into per-route
+# histograms served in the Prometheus text format. The registry lives in the
+# process, so each worker is scraped on its own.
+AUTH = 'auth'
+DB = 'db'
+SERIALIZE = 'serialize'
+RENDER = 'render'
+TIMINGS = (AUTH, DB, SERIALIZE, RENDER)
+UNMATCHED_ROUTE = 'unmatched'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'api'
+SECONDS_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+# Collapses `IN (%s, %s, ...)` so one statement shape is counted once
+# whatever the number of ids it was sent.
+PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+logger = logging.getLogger(__name__)
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = dict.fromkeys(TIMINGS, 0.0)
+        self.active = set()
+        self.queries = 0
+        self.shapes = Counter()
+        self.render_started = None
+
+    def repeated_queries(self) -> list:
+        threshold = getattr(settings, 'METRICS_N_PLUS_ONE_THRESHOLD', 5)
+        return [(shape, count) for shape, count in self.shapes.items() if count >= threshold]
+
+    def server_timing(self, total: float) -> str:
+        entries = [f'{name};dur={self.timings[name] * 1000:.2f}' for name in TIMINGS if self.timings[name]]
+        if self.queries:
+            entries.append(f'queries;desc="{self.queries}"')
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+def current() -> RequestMetrics | None:
+    return _current.get()
+
+
+def begin():
+    return _current.set(RequestMetrics())
+
+
+def end(token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def timing(name: str):
+    # Nested sections of the same kind (a serializer calling another one) are
+    # only counted once.
+    if (metrics := current()) is None or name in metrics.active:
+        yield
+        return
+    metrics.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - started
+        metrics.active.discard(name)
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed on every connection from base/signals.py; a no-op outside requests.
+    if (metrics := current()) is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.timings[DB] += time.perf_counter() - started
+        metrics.queries += 1
+        metrics.shapes[PLACEHOLDER_LIST.sub('(...)', sql)] += 1
+
+
+def render_started(request, response):
+    # process_template_response: DRF responses are rendered right after it.
+    if (metrics := current()) is not None:
+        metrics.render_started = time.perf_counter()
+        response.add_post_render_callback(_render_finished)
+    return response
+
+
+def _render_finished(response):
+    if (metrics := current()) is not None and metrics.render_started is not None:
+        metrics.timings[RENDER] += time.perf_counter() - metrics.render_started
+        metrics.render_started = None
+
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        with timing(SERIALIZE):
+            return super().to_representation(instance)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = Counter()
+
+    def observe(self, name: str, labels: tuple, value: float, buckets: tuple = SECONDS_BUCKETS) -> None:
+        with self.lock:
+            if (histogram := self.histograms.get((name, labels))) is None:
+                histogram = self.histograms[name, labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name: str, labels: tuple, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name, labels] += value
+
+    def clear(self) -> None:
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def exposition(self) -> str:
+        lines, typed = [], set()
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {PREFIX}_{name} histogram')
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+                cumulative += count
+                lines.append(f'{PREFIX}_{name}_bucket{_labels((*labels, ("le", bound)))} {cumulative}')
+            lines.append(f'{PREFIX}_{name}_sum{_labels(labels)} {histogram.sum}')
+            lines.append(f'{PREFIX}_{name}_count{_labels(labels)} {cumulative}')
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {PREFIX}_{name} counter')
+            lines.append(f'{PREFIX}_{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels: tuple) -> str:
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+registry = Registry()
+
+
+def route_of(request) -> str:
+    if (match := getattr(request, 'resolver_match', None)) is None:
+        return UNMATCHED_ROUTE
+    return match.route or match.view_name
+
+
+def finish(request, response, metrics: RequestMetrics):
+    total = time.perf_counter() - metrics.started
+    route = route_of(request)
+    labels = (('method', request.method), ('route', route))
+
+    registry.increment('requests_total', (*labels, ('status', response.status_code)))
+    registry.observe('request_duration_seconds', labels, total)
+    for name in TIMINGS:
+        registry.observe(f'{name}_duration_seconds', labels, metrics.timings[name])
+    registry.observe('db_queries', labels, metrics.queries, QUERY_BUCKETS)
+
+    if repeated := metrics.repeated_queries():
+        registry.increment('n_plus_one_total', labels)
+        for shape, count in repeated:
+            logger.warning('Possible N+1 on %s %s: query ran %d times: %s', request.method, route, count, shape)
+
+    response.headers['Server-Timing'] = metrics.server_timing(total)
+    return response
+
+
+def scrape(request):
+    # Open in DEBUG; otherwise METRICS_TOKEN must be sent as a bearer token.
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        return HttpResponse(status=404)
+    return HttpResponse(registry.exposition(), content_type=CONTENT_TYPE)
@@ -0,0 +1,90 @@
+import asyncio
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+from . import metrics, profiling, routers
+
+
+def _begin(request):
+    primary = request.method not in SAFE_METHODS or routers.STICKY_COOKIE in request.COOKIES
+    return routers.begin_request(request, primary)
+
+
+def _finish(request, response):
+    # Only authenticated writes stick; login and registration change no rows
+    # the client reads back right away.
+    if request.method not in SAFE_METHODS and response.status_code < 400 \
+            and (user_id := routers.request_user_id(request)) is not None:
+        seconds = routers.sticky_seconds()
+        response.set_cookie(routers.STICKY_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+        # Token clients often drop cookies, so the user is marked as well.
+        routers.remember_write(user_id)
+    return response
+
+
+@sync_and_async_middleware
+def replica_routing_middleware(get_response):
+    # Async-capable so the async views are not pushed onto a thread.
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _begin(request)
+            try:
+                response = await get_response(request)
+            finally:
+                routers.end_request(token)
+            return _finish(request, response)
+    else:
+        def middleware(request):
+            token = _begin(request)
+            try:
+                response = get_response(request)
+            finally:
+                routers.end_request(token)
+            return _finish(request, response)
+
+    return middleware
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    # A class, as Django only calls process_template_response on instances;
+    # MiddlewareMixin marks it as a coroutine function in async chains.
+    # Outermost, so the total covers the rest of the middleware as well.
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS', True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = metrics.begin()
+        try:
+            return metrics.finish(request, self.get_response(request), metrics.current())
+        finally:
+            metrics.end(token)
+
+    async def __acall__(self, request):
+        token = metrics.begin()
+        try:
+            return metrics.finish(request, await self.get_response(request), metrics.current())
+        finally:
+            metrics.end(token)
+
+    def process_template_response(self, request, response):
+        return metrics.render_started(request, response)
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if profiling.should_profile(request):
+            return profiling.run_profiled(request, self.get_response)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # cProfile follows one thread and would mix concurrent coroutines,
+        # so async chains are not profiled.
+        return await self.get_response(request)
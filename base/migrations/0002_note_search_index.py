@@ -0,0 +1,50 @@
+from django.db import migrations, OperationalError
+
+# Frozen copy of the FTS5 schema and rowid scheme from base/search.py at the
+# time of this migration, so later changes there cannot alter its effect.
+FTS_TABLE = 'base_note_fts'
+
+
+def fts_rowid(note_id) -> int:
+    value = note_id.int
+    return ((value >> 64) ^ value) & 0x7FFFFFFFFFFFFFFF
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                f"title, body, note_id UNINDEXED, owner_id UNINDEXED, "
+                f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    except OperationalError:
+        # SQLite built without FTS5: searches keep using icontains.
+        return
+    Note = apps.get_model('base', 'Note')
+    rows = [
+        (fts_rowid(note_id), note_id.hex, owner_id.hex, title or '', body or '')
+        for note_id, owner_id, title, body in Note.objects.values_list('id', 'owner_id', 'title', 'body').iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, note_id, owner_id, title, body) VALUES (%s, %s, %s, %s, %s)',
+                rows
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.0.4 on 2026-10-18 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0002_note_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'ordering': ('-created_at', '-id'), 'verbose_name_plural': 'categories'},
+        ),
+        migrations.AlterModelOptions(
+            name='note',
+            options={'ordering': ('-created_at', '-id')},
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='category_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['owner', 'name'], name='category_owner_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='note_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['owner', 'is_pinned', '-created_at', '-id'], name='note_owner_pinned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['owner', 'category', '-created_at', '-id'], name='note_owner_category_idx'),
+        ),
+    ]
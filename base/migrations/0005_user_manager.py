@@ -0,0 +1,20 @@
+# Generated by Django 4.0.4 on 2026-10-18 07:38
+
+import base.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0004_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='myuser',
+            managers=[
+                ('objects', base.models.MyUserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.0.4 on 2026-10-18 08:09
+
+import base.models
+import django.db.models.deletion
+from django.db import migrations, models, OperationalError
+
+# Frozen copy of the FTS5 schema and rowid scheme from base/search.py at the
+# time of this migration, so later changes there cannot alter its effect.
+FTS_TABLE = 'base_note_fts'
+
+
+def fts_rowid(note_id) -> int:
+    value = note_id.int
+    return ((value >> 64) ^ value) & 0x7FFFFFFFFFFFFFFF
+
+
+def index_owner_column(apps, schema_editor):
+    # The owner id becomes an indexed FTS5 column, which needs a new table.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    try:
+        schema_editor.execute(
+                f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+                f"title, body, owner_id, note_id UNINDEXED, "
+                f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    except OperationalError:
+        # SQLite built without FTS5: searches keep using icontains.
+        return
+    Note = apps.get_model('base', 'Note')
+    rows = [
+        (fts_rowid(note_id), note_id.hex, owner_id.hex, title or '', body or '')
+        for note_id, owner_id, title, body in Note.objects.values_list('id', 'owner_id', 'title', 'body').iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, note_id, owner_id, title, body) VALUES (%s, %s, %s, %s, %s)',
+                rows
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0005_user_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteSearchEntry',
+            fields=[
+                ('rowid', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('note', models.OneToOneField(db_column='note_id', db_constraint=False,
+                                              on_delete=django.db.models.deletion.DO_NOTHING,
+                                              related_name='search_entry', to='base.note')),
+                ('owner_id', models.UUIDField()),
+                ('document', base.models.SearchDocumentField(db_column='base_note_fts')),
+            ],
+            options={
+                'db_table': 'base_note_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(index_owner_column, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,29 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db import models, transaction
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext as _
 from uuid import uuid4
 
 
+# Profile columns mirrored on MyUser; kept in sync from base/signals.py.
+PROFILE_USER_FIELDS = ('first_name', 'last_name', 'username', 'email')
+
+
+class MyUserManager(UserManager):
+    def bulk_create_with_profiles(self, users, batch_size=None):
+        # Passwords must already be hashed; no post_save signals are sent.
+        with transaction.atomic(using=self.db):
+            users = self.bulk_create(users, batch_size=batch_size)
+            Profile.objects.using(self.db).bulk_create(
+                    [
+                        Profile(owner=user, **{field: getattr(user, field) for field in PROFILE_USER_FIELDS})
+                        for user in users
+                    ],
+                    batch_size=batch_size
+            )
+        return users
+
+
 # Create your models here.
 class MyUser(AbstractUser):
     USERNAME_FIELD = 'email'
@@ -20,10 +39,29 @@ class MyUser(AbstractUser):
     first_name = models.CharField(max_length=200, null=True, blank=True)
     last_name = models.CharField(max_length=200, null=True, blank=True)
 
+    objects = MyUserManager()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # The profile is inserted from post_save; commit both rows together.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 
 User = get_user_model()
 
 
+class CategoryQuerySet(models.QuerySet):
+    def with_note_stats(self):
+        # One LEFT JOIN + GROUP BY instead of a category_notes request per category.
+        return self.annotate(
+                note_count=models.Count('note'),
+                pinned_count=models.Count('note', filter=models.Q(note__is_pinned=True)),
+                last_note_updated_at=models.Max('note__updated_at'),
+        )
+
+
 class Category(models.Model):
     id = models.UUIDField(
             default=uuid4,
@@ -34,12 +72,21 @@ class Category(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, blank=True)
     name = models.CharField(max_length=50)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CategoryQuerySet.as_manager()
 
     def __str__(self) -> str:
         return str(self.name)
 
     class Meta:
         verbose_name_plural = "categories"
+        ordering = ('-created_at', '-id')
+        indexes = (
+            models.Index(fields=('owner', '-created_at', '-id'), name='category_owner_created_idx'),
+            models.Index(fields=('owner', 'name'), name='category_owner_name_idx'),
+            models.Index(fields=('owner', 'updated_at'), name='category_owner_updated_idx'),
+        )
 
 
 class Note(models.Model):
@@ -65,6 +112,53 @@ class Note(models.Model):
     def __str__(self) -> str:
         return str(self.title)
 
+    class Meta:
+        ordering = ('-created_at', '-id')
+        indexes = (
+            models.Index(fields=('owner', '-created_at', '-id'), name='note_owner_created_idx'),
+            models.Index(fields=('owner', 'is_pinned', '-created_at', '-id'), name='note_owner_pinned_idx'),
+            models.Index(fields=('owner', 'category', '-created_at', '-id'), name='note_owner_category_idx'),
+            models.Index(fields=('owner', 'updated_at'), name='note_owner_updated_idx'),
+        )
+
+
+class FTSMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+class SearchDocumentField(models.TextField):
+    """
+    The hidden column an FTS5 table has under its own name; it takes `match`
+    lookups and is the first argument of the bm25()/snippet() functions.
+    """
+
+
+SearchDocumentField.register_lookup(FTSMatch)
+
+
+class NoteSearchEntry(models.Model):
+    # Read-only mapping of the FTS5 index that base/search.py creates and
+    # fills, so searches join it through the ORM (`note.search_entry`).
+    rowid = models.BigIntegerField(primary_key=True)
+    note = models.OneToOneField(
+            Note,
+            on_delete=models.DO_NOTHING,
+            db_column='note_id',
+            db_constraint=False,
+            related_name='search_entry'
+    )
+    owner_id = models.UUIDField()
+    document = SearchDocumentField(db_column='base_note_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'base_note_fts'
+
 
 class Profile(models.Model):
     id = models.UUIDField(
@@ -83,3 +177,61 @@ class Profile(models.Model):
 
     def __str__(self) -> str:
         return str(self.username)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {name: instance.__dict__[name] for name in field_names}
+        return instance
+
+    def changed_fields(self) -> list:
+        loaded = getattr(self, '_loaded_values', {})
+        return [
+            name for name, value in loaded.items()
+            if name != self._meta.pk.attname and getattr(self, name) != value
+        ]
+
+    def save(self, *args, **kwargs):
+        # Saves of loaded profiles only write the columns that changed and
+        # skip the query entirely when nothing did.
+        if not args and not self._state.adding and kwargs.get('update_fields') is None \
+                and hasattr(self, '_loaded_values'):
+            if not (changed := self.changed_fields()):
+                return
+            kwargs['update_fields'] = [*changed, 'updated_at']
+
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+        if hasattr(self, '_loaded_values'):
+            self._loaded_values.update({name: getattr(self, name) for name in self._loaded_values})
+
+
+class Tombstone(models.Model):
+    NOTE = 'note'
+    CATEGORY = 'category'
+    KINDS = (
+        (NOTE, 'Note'),
+        (CATEGORY, 'Category'),
+    )
+
+    id = models.UUIDField(
+            default=uuid4,
+            unique=True,
+            primary_key=True,
+            editable=False
+    )
+    # Plain column rather than a foreign key: tombstones are written while a
+    # user's notes are cascade-deleted and must not block deleting the user.
+    owner_id = models.UUIDField()
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.UUIDField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f'{self.kind} {self.object_id}'
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('owner_id', 'deleted_at'), name='tombstone_owner_deleted_idx'),
+        )
@@ -1,5 +1,204 @@
-from rest_framework.pagination import LimitOffsetPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from functools import partial
+from uuid import UUID
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+COUNT_QUERY_PARAM = 'count'
+PAGINATION_QUERY_PARAMS = ('limit', 'offset', 'cursor', 'pagination')
+
+
+def parse_aware_datetime(value: str):
+    # Cursors are written from aware datetimes; anything else was not issued by us.
+    if (parsed := parse_datetime(value)) is None or timezone.is_naive(parsed):
+        raise ValueError(value)
+    return parsed
+
+
+def count_requested(request) -> bool:
+    value = request.query_params.get(COUNT_QUERY_PARAM, 'true')
+    return value.lower() not in ('0', 'false', 'no')
+
+
+def pagination_requested(request) -> bool:
+    return any(param in request.query_params for param in PAGINATION_QUERY_PARAMS)
 
 
 class StandardResultsSetPagination(LimitOffsetPagination):
     default_limit = 15
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if count_requested(request):
+            return super().paginate_queryset(queryset, request, view)
+
+        # Without a total we fetch one extra row to know whether a next page exists.
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.count = None
+        self.request = request
+        self.display_page_controls = False
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def get_next_link(self):
+        if self.count is not None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is None:
+            del response.data['count']
+        return response
+
+
+class KeysetResultsSetPagination(BasePagination):
+    """
+    Seek pagination over `ordering`; every page costs the same regardless of depth.
+    """
+    page_size = 15
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    cursor_parsers = {'created_at': parse_aware_datetime, 'id': UUID}
+    invalid_cursor_message = 'Invalid cursor'
+    ordered_message = 'Cursor pagination keeps its own order; page ranked results with limit/offset.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Paging would silently replace an explicit order, such as search rank.
+        if queryset.query.order_by and tuple(queryset.query.order_by) != self.ordering:
+            raise ValidationError({self.cursor_query_param: self.ordered_message})
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = queryset.count() if count_requested(request) else None
+
+        reverse, values = self.decode_cursor(request)
+        queryset = queryset.order_by(*self.get_ordering(reverse))
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_filter(values, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request) -> int:
+        try:
+            return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, reverse: bool) -> tuple:
+        if not reverse:
+            return self.ordering
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering)
+
+    def get_keyset_filter(self, values: list, reverse: bool) -> Q:
+        # (a, b) after (x, y) <=> a > x OR (a = x AND b > y), flipped per field direction.
+        keyset, equal = Q(), {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            keyset |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return keyset
+
+    def get_position(self, obj) -> list:
+        # Rows are model instances or, on the .values() fast path, dicts.
+        get = obj.__getitem__ if isinstance(obj, dict) else partial(getattr, obj)
+        values = (get(field.lstrip('-')) for field in self.ordering)
+        return [value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values]
+
+    def encode_cursor(self, reverse: bool, obj) -> str:
+        raw = json.dumps([int(reverse), *self.get_position(obj)], separators=(',', ':'))
+        cursor = urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request) -> tuple:
+        if not (cursor := request.query_params.get(self.cursor_query_param)):
+            return False, None
+        try:
+            decoded = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if not isinstance(decoded, list) or len(decoded) != len(self.ordering) + 1 \
+                    or decoded[0] not in (0, 1):
+                raise ValueError(cursor)
+            values = [self.cursor_parsers[field.lstrip('-')](value)
+                      for field, value in zip(self.ordering, decoded[1:])]
+        except (BinasciiError, UnicodeDecodeError, ValueError, TypeError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(decoded[0]), values
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.page[0])
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+
+class SwitchableResultsSetPagination(BasePagination):
+    """
+    Limit/offset by default; `?pagination=cursor` (or any `?cursor=`) selects keyset paging.
+    """
+    mode_query_param = 'pagination'
+    offset_class = StandardResultsSetPagination
+    keyset_class = KeysetResultsSetPagination
+
+    def __init__(self):
+        self.paginator = self.offset_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if params.get(self.mode_query_param) == 'cursor' or self.keyset_class.cursor_query_param in params:
+            self.paginator = self.keyset_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    @property
+    def display_page_controls(self) -> bool:
+        return getattr(self.paginator, 'display_page_controls', False)
+
+    def to_html(self):
+        return self.paginator.to_html()
@@ -0,0 +1,205 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from pathlib import Path
+from uuid import uuid4
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from .authentication import StatelessJWTAuthentication
+from .renderers import json_dumps
+
+# On-demand cProfile captures and a slow-query log. A request is profiled
+# when an admin sends `X-Profile: 1` or it is picked by PROFILE_SAMPLE_RATE,
+# and only if its path matches PROFILE_PATHS. Stats files go to PROFILE_DIR
+# (shared by workers) and are served to admins at /profiles/<id>; the id is
+# returned in the X-Profile-Id header. Slow queries (off unless
+# SLOW_QUERY_MS is set) are logged, with their query plan when
+# SLOW_QUERY_EXPLAIN is on, and the most recent ones kept per process.
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_SUFFIX = '.prof'
+META_SUFFIX = '.json'
+TEXT_FORMAT = 'text'
+TEXT_LIMIT = 60
+EXPLAINED_STATEMENTS = ('SELECT', 'WITH')
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('base.slow_queries')
+_explaining = ContextVar('explaining_query', default=False)
+_slow_queries = deque(maxlen=getattr(settings, 'SLOW_QUERY_LOG_SIZE', 100))
+_slow_queries_lock = threading.Lock()
+
+
+def profile_dir() -> Path:
+    return Path(getattr(settings, 'PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+
+@lru_cache(maxsize=None)
+def _path_pattern(pattern: str):
+    return re.compile(pattern)
+
+
+def is_admin(request) -> bool:
+    # Admin site sessions or a JWT of a staff account. Tokens carry no staff
+    # flag, so the account is looked up; only done for requests asking for it.
+    if (user := getattr(request, 'user', None)) is not None and user.is_authenticated and user.is_staff:
+        return True
+    try:
+        authenticated = StatelessJWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return False
+    if authenticated is None:
+        return False
+    return User.objects.filter(pk=authenticated[0].id, is_staff=True, is_active=True).exists()
+
+
+def should_profile(request) -> bool:
+    if not _path_pattern(getattr(settings, 'PROFILE_PATHS', r'')).search(request.path):
+        return False
+    if request.headers.get(PROFILE_HEADER, '').lower() in ('1', 'true', 'yes'):
+        return is_admin(request)
+    return random.random() < getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+
+
+def _prune(directory: Path) -> None:
+    keep = getattr(settings, 'PROFILE_KEEP', 50)
+    for path in sorted(directory.glob(f'*{PROFILE_SUFFIX}'), reverse=True)[keep:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(META_SUFFIX).unlink(missing_ok=True)
+
+
+def save_profile(profile: cProfile.Profile, request, response, duration: float) -> str:
+    # Ids sort by creation time, which _prune() relies on.
+    profile_id = f'{time.strftime("%Y%m%d%H%M%S")}-{uuid4().hex[:8]}'
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profile.dump_stats(directory / f'{profile_id}{PROFILE_SUFFIX}')
+    (directory / f'{profile_id}{META_SUFFIX}').write_bytes(json_dumps({
+        'id': profile_id,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 2),
+    }))
+    _prune(directory)
+    return profile_id
+
+
+def run_profiled(request, get_response):
+    profile = cProfile.Profile()
+    started = time.perf_counter()
+    profile.enable()
+    try:
+        response = get_response(request)
+    finally:
+        profile.disable()
+    try:
+        response.headers[PROFILE_ID_HEADER] = save_profile(profile, request, response,
+                                                           time.perf_counter() - started)
+    except OSError:
+        logger.exception('Could not store the profile of %s %s', request.method, request.path)
+    return response
+
+
+def slow_query_threshold() -> float:
+    return getattr(settings, 'SLOW_QUERY_MS', 0) / 1000
+
+
+def explain(connection, sql: str, params) -> list:
+    # A bare backend cursor skips the execute wrappers, so the EXPLAIN is
+    # neither timed nor explained itself.
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        return [' '.join(str(column) for column in row) if connection.vendor != 'sqlite' else row[-1]
+                for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def log_slow_query(execute, sql, params, many, context):
+    # Installed on every connection from base/signals.py.
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if (threshold := slow_query_threshold()) and (duration := time.perf_counter() - started) >= threshold:
+            _record_slow_query(context['connection'], sql, params, many, duration)
+
+
+def _record_slow_query(connection, sql: str, params, many: bool, duration: float) -> None:
+    plan = None
+    if getattr(settings, 'SLOW_QUERY_EXPLAIN', False) and not many \
+            and sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+        token = _explaining.set(True)
+        try:
+            plan = explain(connection, sql, params)
+        except Exception as exc:
+            plan = [f'EXPLAIN failed: {exc}']
+        finally:
+            _explaining.reset(token)
+
+    entry = {
+        'time': time.time(),
+        'database': connection.alias,
+        'duration_ms': round(duration * 1000, 2),
+        'sql': sql,
+        'params': None if many else [str(param) for param in params or ()],
+        'plan': plan,
+    }
+    with _slow_queries_lock:
+        _slow_queries.append(entry)
+    slow_query_logger.warning('Slow query (%.1f ms) on %s: %s\n%s', entry['duration_ms'], connection.alias,
+                              sql, '\n'.join(plan or ()))
+
+
+def slow_queries() -> list:
+    with _slow_queries_lock:
+        return list(reversed(_slow_queries))
+
+
+def admin_only(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_admin(request):
+            raise Http404
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@admin_only
+def profile_list(request):
+    profiles = [json.loads(path.read_bytes()) for path in sorted(profile_dir().glob(f'*{META_SUFFIX}'), reverse=True)]
+    return JsonResponse({'results': profiles})
+
+
+@admin_only
+def profile_download(request, profile_id: str):
+    # profile_id is matched by the slug converter, so it cannot leave the directory.
+    if not (path := profile_dir() / f'{profile_id}{PROFILE_SUFFIX}').is_file():
+        raise Http404
+    if request.GET.get('format') == TEXT_FORMAT:
+        output = io.StringIO()
+        pstats.Stats(str(path), stream=output).sort_stats('cumulative').print_stats(TEXT_LIMIT)
+        return HttpResponse(output.getvalue(), content_type='text/plain; charset=utf-8')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
+
+
+@admin_only
+def slow_query_list(request):
+    return JsonResponse({'results': slow_queries()})
@@ -0,0 +1,84 @@
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject
+
+# Reads inside a request go to a replica unless the request writes, the
+# client wrote within REPLICA_STICKY_SECONDS (cookie or per-user cache
+# marker), or a transaction is open on the primary. Code running outside a
+# request (commands, shells, background threads) always uses the primary.
+STICKY_COOKIE = 'db_primary'
+RECENT_WRITE_KEY = 'db:recent_write:{}'
+
+_routing = ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, request, primary: bool):
+        self.request = request
+        self.primary = primary
+        self.checked_user = None
+
+
+def sticky_seconds() -> int:
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+def begin_request(request, primary: bool):
+    return _routing.set(RoutingState(request, primary))
+
+
+def end_request(token) -> None:
+    _routing.reset(token)
+
+
+def request_user_id(request):
+    # DRF stores the authenticated user on the Django request; the lazy
+    # session user set by AuthenticationMiddleware is never evaluated here,
+    # as loading it would itself be a routed read.
+    user = request.__dict__.get('user')
+    if user is None or isinstance(user, SimpleLazyObject) or not user.is_authenticated:
+        return None
+    return user.id
+
+
+def remember_write(user_id) -> None:
+    cache.set(RECENT_WRITE_KEY.format(user_id), True, sticky_seconds())
+
+
+def wrote_recently(user_id) -> bool:
+    return bool(cache.get(RECENT_WRITE_KEY.format(user_id)))
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.replicas = list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+    def use_primary(self) -> bool:
+        if (state := _routing.get()) is None or state.primary:
+            return True
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return True
+        if (user_id := request_user_id(state.request)) is not None and user_id != state.checked_user:
+            state.checked_user = user_id
+            state.primary = wrote_recently(user_id)
+        return state.primary
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or self.use_primary():
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are physical copies of the primary (streaming replication,
+        # copied SQLite files) and receive schema changes through it.
+        return db not in self.replicas
@@ -0,0 +1,170 @@
+from functools import lru_cache, partial
+from django.db.models import QuerySet
+from django.db.models.functions import Substr
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+from .metrics import SERIALIZE, timing
+
+# Read-only fast path for list endpoints. Rows are fetched with .values() and
+# mapped to the JSON a ModelSerializer would produce for them, without model
+# instances or per-row field machinery. Only plain columns, annotations and
+# primary-key relations are supported; the ModelSerializer stays the source
+# of truth for field names and order. Only the selected columns are fetched,
+# so an excluded or previewed body is never loaded into Python.
+FIELDS_QUERY_PARAM = 'fields'
+BODY_QUERY_PARAM = 'body'
+PREVIEW_QUERY_PARAM = 'preview'
+ALWAYS_INCLUDED = ('id',)
+# `?preview=N` cuts this field to N characters in the database.
+PREVIEW_FIELD = 'body'
+PREVIEW_COLUMN = 'body_preview'
+
+
+def _datetime(value, tz=None):
+    # Same output as DRF's DateTimeField with the ISO 8601 format.
+    value = value.astimezone(tz or timezone.get_current_timezone()).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+CONVERTERS = {
+    serializers.DateTimeField: _datetime,
+    serializers.UUIDField: str,
+    serializers.CharField: None,
+    serializers.BooleanField: None,
+    serializers.IntegerField: None,
+    serializers.FloatField: None,
+    PrimaryKeyRelatedField: None,
+}
+
+
+def _converter(field):
+    for field_class in type(field).__mro__:
+        if field_class in CONVERTERS:
+            return CONVERTERS[field_class]
+    return field.to_representation
+
+
+@lru_cache(maxsize=None)
+def _field_map(serializer_class) -> dict:
+    return {name: (field.source, _converter(field)) for name, field in serializer_class().fields.items()}
+
+
+def field_names(serializer_class) -> tuple:
+    return tuple(_field_map(serializer_class))
+
+
+def requested_fields(query_params, serializer_class) -> tuple | None:
+    # `?fields=a,b` selects columns (the id is always included) and
+    # `?body=false` drops the note body; None means every field.
+    available = field_names(serializer_class)
+    fields = None
+    if value := query_params.get(FIELDS_QUERY_PARAM):
+        requested = {name.strip() for name in value.split(',') if name.strip()}
+        if unknown := requested - set(available):
+            raise serializers.ValidationError({FIELDS_QUERY_PARAM: f'Unknown fields: {", ".join(sorted(unknown))}.'})
+        fields = tuple(name for name in available if name in requested or name in ALWAYS_INCLUDED)
+    if query_params.get(BODY_QUERY_PARAM, '').lower() in ('0', 'false', 'no'):
+        fields = tuple(name for name in fields or available if name != 'body')
+    return fields
+
+
+def requested_preview(query_params) -> int | None:
+    if not (value := query_params.get(PREVIEW_QUERY_PARAM)):
+        return None
+    try:
+        if (length := int(value)) > 0:
+            return length
+    except ValueError:
+        pass
+    raise serializers.ValidationError({PREVIEW_QUERY_PARAM: 'Expected a positive number of characters.'})
+
+
+class RowSerializer:
+    """
+    Serializer-shaped wrapper (`Serializer(rows, many=True).data`,
+    `to_representation(row)`) so pagination and streaming work unchanged.
+    """
+    columns = ()
+    preview = None
+
+    def __init__(self, instance=None, many=False, **kwargs):
+        self.instance = instance
+        self.many = many
+        # The active timezone is looked up once, not per datetime value.
+        tz = timezone.get_current_timezone()
+        self.converters = [
+            (name, column, partial(convert, tz=tz) if convert is _datetime else convert)
+            for name, column, convert in self.columns
+        ]
+
+    @classmethod
+    def values(cls, queryset):
+        if not isinstance(queryset, QuerySet):
+            return queryset
+        # Ordering columns are fetched too so keyset cursors can be built
+        # from rows whose `?fields=` selection leaves them out.
+        ordering = (field.lstrip('-') for field in queryset.model._meta.ordering)
+        if cls.preview is not None:
+            queryset = queryset.annotate(**{PREVIEW_COLUMN: Substr(PREVIEW_FIELD, 1, cls.preview)})
+        return queryset.values(*dict.fromkeys((*(column for _, column, _ in cls.columns), *ordering)))
+
+    def to_representation(self, row: dict) -> dict:
+        data = {}
+        for name, column, convert in self.converters:
+            value = row[column]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    @property
+    def data(self):
+        with timing(SERIALIZE):
+            if self.many:
+                return [self.to_representation(row) for row in self.instance]
+            return self.to_representation(self.instance)
+
+
+@lru_cache(maxsize=256)
+def row_serializer(serializer_class, fields: tuple | None = None, preview: int | None = None) -> type:
+    field_map = _field_map(serializer_class)
+    names = fields if fields is not None else tuple(field_map)
+    if PREVIEW_FIELD not in names:
+        preview = None
+
+    columns = []
+    for name in names:
+        column, convert = field_map[name]
+        if preview is not None and name == PREVIEW_FIELD:
+            column = PREVIEW_COLUMN
+        columns.append((name, column, convert))
+    return type(f'{serializer_class.__name__}Rows', (RowSerializer,), {'columns': tuple(columns), 'preview': preview})
+
+
+def query_row_serializer(query_params, serializer_class) -> type:
+    return row_serializer(
+            serializer_class,
+            requested_fields(query_params, serializer_class),
+            requested_preview(query_params)
+    )
+
+
+def request_row_serializer(request, serializer_class) -> type:
+    return query_row_serializer(request.query_params, serializer_class)
+
+
+class RowListMixin:
+    """
+    Serves `list` through a RowSerializer of the view's serializer class.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = request_row_serializer(request, self.get_serializer_class())
+        queryset = serializer_class.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer_class(page, many=True).data)
+        return Response(serializer_class(queryset, many=True).data)
@@ -0,0 +1,167 @@
+import re
+from uuid import UUID
+from django.db import connections, OperationalError
+from django.db.models import Case, CharField, F, FloatField, Func, Q, QuerySet, Value, When
+from .models import Note, NoteSearchEntry
+
+# SQLite FTS5 inverted index over note titles and bodies. The index is a
+# standalone FTS5 table (not an external-content one) so it survives Django
+# rebuilding `base_note` during migrations; rows are kept in sync from the
+# `Note` post_save/post_delete handlers in `base/signals.py`. The owner id is
+# an indexed column and part of every MATCH, so a search only walks the
+# caller's postings rather than every user's; the search terms themselves
+# are limited to the title and body columns.
+FTS_TABLE = NoteSearchEntry._meta.db_table
+TEXT_COLUMNS = '{title body}'
+TITLE_COLUMN = 0
+BODY_COLUMN = 1
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+OWNER_WEIGHT = 0.0
+SNIPPET_TOKENS = 12
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_available = {}
+
+
+def fts_rowid(note_id: UUID) -> int:
+    # FTS5 rowids are signed 64-bit integers; fold the UUID into 63 bits so
+    # single rows can be replaced or removed without scanning the index.
+    value = note_id.int
+    return ((value >> 64) ^ value) & 0x7FFFFFFFFFFFFFFF
+
+
+def is_available(using: str = 'default') -> bool:
+    if using not in _available:
+        connection = connections[using]
+        ready = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                        [FTS_TABLE]
+                )
+                ready = cursor.fetchone() is not None
+        _available[using] = ready
+    return _available[using]
+
+
+def build_match_query(text: str, owner_id: UUID = None) -> str:
+    # Every term is quoted (so FTS5 operators in user input are literal) and
+    # prefix-matched, which suits search-as-you-type clients.
+    if not (terms := ' '.join(f'"{token}"*' for token in _TOKEN_RE.findall(text))):
+        return ''
+    terms = f'{TEXT_COLUMNS} : ({terms})'
+    if owner_id is None:
+        return terms
+    return f'owner_id : "{UUID(str(owner_id)).hex}" AND {terms}'
+
+
+def _snippet(column: int) -> Func:
+    return Func(
+            F('search_entry__document'), Value(column), Value(HIGHLIGHT_OPEN), Value(HIGHLIGHT_CLOSE), Value('…'),
+            Value(SNIPPET_TOKENS), function='snippet', output_field=CharField()
+    )
+
+
+def search_notes(notes: QuerySet, text: str, owner_id: UUID = None) -> QuerySet:
+    match = build_match_query(text, owner_id)
+    if not match or not is_available(notes.db):
+        return notes.filter(
+                Q(title__icontains=text)
+                | Q(body__icontains=text)
+        ).annotate(
+                search_rank=Value(None, output_field=FloatField()),
+                search_snippet=Value(None, output_field=CharField()),
+        )
+
+    # The body excerpt when the body matched, otherwise the title; never the
+    # owner column, which every row matches.
+    return notes.filter(search_entry__document__match=match).alias(
+            body_snippet=_snippet(BODY_COLUMN),
+    ).annotate(
+            search_rank=-Func(
+                    F('search_entry__document'), Value(TITLE_WEIGHT), Value(BODY_WEIGHT), Value(OWNER_WEIGHT),
+                    function='bm25', output_field=FloatField()
+            ),
+            search_snippet=Case(
+                    When(body_snippet__contains=HIGHLIGHT_OPEN, then=F('body_snippet')),
+                    default=_snippet(TITLE_COLUMN),
+            ),
+    ).order_by('-search_rank')
+
+
+def _row(note: Note, connection) -> tuple:
+    return (
+        fts_rowid(note.pk),
+        Note._meta.pk.get_db_prep_value(note.pk, connection),
+        Note._meta.pk.get_db_prep_value(note.owner_id, connection),
+        note.title or '',
+        note.body or '',
+    )
+
+
+def index_notes(notes, using: str = 'default') -> None:
+    if not is_available(using):
+        return
+    connection = connections[using]
+    rows = [_row(note, connection) for note in notes]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(row[0],) for row in rows]
+        )
+        cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, note_id, owner_id, title, body) '
+                f'VALUES (%s, %s, %s, %s, %s)',
+                rows
+        )
+
+
+def unindex_notes(note_ids, using: str = 'default') -> None:
+    if not is_available(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(fts_rowid(note_id),) for note_id in note_ids]
+        )
+
+
+def create_index(connection) -> bool:
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                    f"title, body, owner_id, note_id UNINDEXED, "
+                    f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+    except OperationalError:
+        # SQLite built without FTS5: searches keep using icontains.
+        return False
+    _available.pop(connection.alias, None)
+    return True
+
+
+def rebuild_index(using: str = 'default', chunk_size: int = 2000, model=Note) -> int:
+    connection = connections[using]
+    if not create_index(connection):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    batch, total = [], 0
+    notes = model._default_manager.using(using).only('id', 'owner', 'title', 'body')
+    for note in notes.iterator(chunk_size=chunk_size):
+        batch.append(note)
+        if len(batch) >= chunk_size:
+            index_notes(batch, using)
+            total += len(batch)
+            batch = []
+    index_notes(batch, using)
+    return total + len(batch)
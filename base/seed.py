@@ -0,0 +1,122 @@
+import math
+import random
+from uuid import UUID
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from .models import MyUser, Category, Note
+from .search import index_notes
+
+# Synthetic datasets for benchmarks. Everything derives from one seeded RNG
+# (ids included), so the same arguments always produce the same rows. Note
+# counts per user follow a Zipf-like curve and body lengths a log-normal
+# one, which is roughly what real note apps look like: a few heavy users and
+# mostly short notes with a long tail.
+SEED_PASSWORD = 'bench-password'
+WORDS = (
+    'meeting notes project deadline grocery milk bread coffee idea draft review budget travel '
+    'flight hotel booking recipe dinner lunch workout running book chapter quote todo urgent '
+    'later follow call email client invoice payment report summary plan weekly monthly goal '
+    'garden plant water birthday gift party music playlist movie series episode code bug fix '
+    'deploy release server database query index cache latency shopping list honey tea apple '
+    'orange lemon doctor appointment school homework exam lecture research paper thesis'
+).split()
+TITLE_WORDS = (1, 6)
+BODY_MEDIAN = 280
+BODY_SIGMA = 1.1
+BODY_MAX = 20000
+
+
+def _uuid(rng: random.Random) -> UUID:
+    return UUID(int=rng.getrandbits(128), version=4)
+
+
+def note_counts(rng: random.Random, users: int, total: int, skew: float) -> list:
+    weights = [1 / rank ** skew for rank in range(1, users + 1)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for index in range(total - sum(counts)):
+        counts[index % users] += 1
+    rng.shuffle(counts)
+    return counts
+
+
+def _text(rng: random.Random, length: int) -> str:
+    words = rng.choices(WORDS, k=max(1, length // 6 + 1))
+    return ' '.join(words)[:length]
+
+
+def _body(rng: random.Random) -> str | None:
+    if rng.random() < 0.05:
+        return None
+    length = int(rng.lognormvariate(math.log(BODY_MEDIAN), BODY_SIGMA))
+    return _text(rng, min(max(length, 1), BODY_MAX))
+
+
+def seed_users(rng: random.Random, count: int, prefix: str, batch_size: int) -> list:
+    password = make_password(SEED_PASSWORD)
+    users = [
+        MyUser(
+                id=_uuid(rng),
+                username=f'{prefix}{index:06d}',
+                email=f'{prefix}{index:06d}@example.com',
+                first_name=f'{prefix.title()}{index}',
+                password=password,
+        )
+        for index in range(count)
+    ]
+    return MyUser.objects.bulk_create_with_profiles(users, batch_size=batch_size)
+
+
+def seed_categories(rng: random.Random, users: list, per_user: int, batch_size: int) -> dict:
+    categories = {
+        user.pk: [Category(id=_uuid(rng), owner=user, name=_text(rng, 20).title()) for _ in range(per_user)]
+        for user in users
+    }
+    Category.objects.bulk_create([c for owned in categories.values() for c in owned], batch_size=batch_size)
+    return categories
+
+
+def seed_notes(rng: random.Random, users: list, categories: dict, total: int, skew: float,
+               batch_size: int, progress=None) -> int:
+    created, batch = 0, []
+
+    def flush():
+        nonlocal created, batch
+        with transaction.atomic():
+            Note.objects.bulk_create(batch, batch_size=batch_size)
+            # bulk_create() sends no post_save, so the search index is fed here.
+            index_notes(batch)
+        created += len(batch)
+        batch = []
+        if progress:
+            progress(created)
+
+    for user, count in zip(users, note_counts(rng, len(users), total, skew)):
+        owned = categories.get(user.pk, [])
+        for _ in range(count):
+            batch.append(Note(
+                    id=_uuid(rng),
+                    owner=user,
+                    title=' '.join(rng.choices(WORDS, k=rng.randint(*TITLE_WORDS))).capitalize()[:50],
+                    body=_body(rng),
+                    is_pinned=rng.random() < 0.1,
+                    category=rng.choice(owned) if owned and rng.random() < 0.7 else None,
+            ))
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    return created
+
+
+def seed(users: int, notes: int, categories_per_user: int = 5, skew: float = 1.1, seed_value: int = 42,
+         prefix: str = 'bench', batch_size: int = 5000, progress=None) -> dict:
+    rng = random.Random(seed_value)
+    created_users = seed_users(rng, users, prefix, batch_size)
+    categories = seed_categories(rng, created_users, categories_per_user, batch_size)
+    created_notes = seed_notes(rng, created_users, categories, notes, skew, batch_size, progress)
+    return {
+        'users': len(created_users),
+        'categories': sum(map(len, categories.values())),
+        'notes': created_notes,
+    }
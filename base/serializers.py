@@ -1,37 +1,80 @@
 from rest_framework import serializers
 from .models import Note, Category, Profile
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from .metrics import TimedSerializerMixin
+from .tokens import access_token_for
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Note
         fields = '__all__'
+        read_only_fields = ('owner',)
 
+    def owner_id(self):
+        # An existing note keeps its owner; new notes take it from the context,
+        # either the authenticated request or an explicit `owner_id`.
+        if self.instance is not None:
+            return self.instance.owner_id
+        if 'owner_id' in self.context:
+            return self.context['owner_id']
+        if request := self.context.get('request'):
+            return request.user.id
+        return None
 
-class CategorySerializer(serializers.ModelSerializer):
+    def validate_category(self, category: Category | None) -> Category | None:
+        if category is not None and category.owner_id != self.owner_id():
+            raise serializers.ValidationError('Unknown category.')
+        return category
+
+
+class NoteSearchSerializer(NoteSerializer):
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+    snippet = serializers.CharField(source='search_snippet', read_only=True)
+
+
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
+        read_only_fields = ('owner',)
+
 
+class CategoryStatsSerializer(CategorySerializer):
+    # Filled by Category.objects.with_note_stats() on list endpoints.
+    note_count = serializers.IntegerField(read_only=True)
+    pinned_count = serializers.IntegerField(read_only=True)
+    last_note_updated_at = serializers.DateTimeField(read_only=True)
 
-class ProfileSerializer(serializers.ModelSerializer):
+    class Meta(CategorySerializer.Meta):
+        fields = ('id', 'name', 'created_at', 'updated_at', 'owner',
+                  'note_count', 'pinned_count', 'last_note_updated_at')
+
+
+class ProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     token = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Profile
         fields = ('id', 'first_name', 'last_name', 'email', 'username', 'owner', 'token')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Signing a token is opt-in so plain profile reads stay crypto free.
+        if not (self.context.get('access_token') or self.context.get('include_token')):
+            self.fields.pop('token')
+
     def get_token(self, obj: Profile) -> str:
-        token = RefreshToken.for_user(obj.owner)
-        return str(token.access_token)
+        # The login view passes the access token it has just issued.
+        if token := self.context.get('access_token'):
+            return token
+        return access_token_for(obj.owner_id)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     token = serializers.SerializerMethodField(read_only=True)
     password = serializers.CharField(
             style={'input_type': 'password'},
@@ -42,9 +85,8 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'email', 'password', 'username', 'first_name', 'last_name', 'token')
 
-    def get_token(self, obj: Profile) -> str:
-        token = RefreshToken.for_user(obj)
-        return str(token.access_token)
+    def get_token(self, obj: User) -> str:
+        return access_token_for(obj.pk)
 
 
 # Custom Token
@@ -52,7 +94,10 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs) -> dict:
         data = super().validate(attrs)
 
-        serializer = ProfileSerializer(self.user.profile).data
+        serializer = ProfileSerializer(
+                self.user.profile,
+                context={'access_token': data['access']}
+        ).data
         # fields = ('id', 'name', 'email', 'username', 'user', 'token')
         for k, v in serializer.items():
             data[k] = v
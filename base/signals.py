@@ -1,32 +1,48 @@
-from django.db.models.signals import post_save, post_delete
-from .models import Profile
+from functools import partial
+import django
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import Signal
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.utils import timezone
+from .models import Profile, Note, Category, Tombstone, PROFILE_USER_FIELDS
+from . import caching, events, metrics, profiling, search
+from .authentication import forget_active_status
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+# Sent by base.bulk after bulk_create/bulk_update, which bypass post_save.
+notes_bulk_saved = Signal()
 
-def create_profile(sender, instance, created, **kwargs):
-    if created:
+
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
         user = instance
-        profile = Profile.objects.create(
+        Profile.objects.create(
                 owner=user,
-                username=user.username,
-                email=user.email,
-                first_name=user.first_name,
-                last_name=user.last_name,
+                **{field: getattr(user, field) for field in PROFILE_USER_FIELDS}
         )
 
 
-def update_user(sender, instance, created, **kwargs):
+def update_user(sender, instance, created, update_fields, raw=False, **kwargs):
     profile = instance
-    user = profile.owner
+    if created or raw:
+        return
+
+    fields = [field for field in PROFILE_USER_FIELDS if update_fields is None or field in update_fields]
+    if not fields:
+        return
 
-    if not created:
-        user.first_name = profile.first_name
-        user.last_name = profile.last_name
-        user.username = profile.username
-        user.email = profile.email
-        user.save()
+    values = {field: getattr(profile, field) for field in fields}
+    # A queryset update writes only these columns (never the password hash),
+    # sends no MyUser post_save and matches no row when nothing changed.
+    User.objects.filter(pk=profile.owner_id).exclude(**values).update(**values)
+    if Profile.owner.is_cached(profile):
+        for field, value in values.items():
+            setattr(profile.owner, field, value)
 
 
 def delete_user(sender, instance, **kwargs):
@@ -37,6 +53,118 @@ def delete_user(sender, instance, **kwargs):
         pass
 
 
+def reset_active_status(sender, instance, **kwargs):
+    forget_active_status(instance.pk)
+
+
+def index_note(sender, instance, using, update_fields, **kwargs):
+    if update_fields and not {'title', 'body'} & set(update_fields):
+        return
+    search.index_notes((instance,), using=using)
+
+
+def index_bulk_notes(sender, created, updated, update_fields, **kwargs):
+    notes = list(created)
+    if {'title', 'body'} & set(update_fields):
+        notes.extend(updated)
+    search.index_notes(notes)
+
+
+def unindex_note(sender, instance, using, **kwargs):
+    search.unindex_notes((instance.pk,), using=using)
+
+
+def bury_note(sender, instance, **kwargs):
+    Tombstone.objects.create(owner_id=instance.owner_id, kind=Tombstone.NOTE, object_id=instance.pk)
+
+
+def bury_category(sender, instance, **kwargs):
+    Tombstone.objects.create(owner_id=instance.owner_id, kind=Tombstone.CATEGORY, object_id=instance.pk)
+
+
+def touch_category_notes(sender, instance, **kwargs):
+    # The SET_NULL on Note.category is a plain UPDATE; bump updated_at so
+    # delta sync clients also see the notes lose their category.
+    Note.objects.filter(category_id=instance.pk).update(updated_at=timezone.now())
+
+
+def invalidate_note_responses(sender, instance=None, owner_id=None, **kwargs):
+    owner_id = owner_id or instance.owner_id
+    transaction.on_commit(partial(caching.invalidate, owner_id, caching.NOTES))
+
+
+def invalidate_category_responses(sender, instance, signal, **kwargs):
+    # Deleting a category also clears it from its notes (SET_NULL).
+    scopes = (caching.CATEGORIES, caching.NOTES) if signal is post_delete else (caching.CATEGORIES,)
+    transaction.on_commit(partial(caching.invalidate, instance.owner_id, *scopes))
+
+
+def publish_note_event(sender, instance, signal, **kwargs):
+    event_type = events.NOTE_DELETED if signal is post_delete else events.NOTE_SAVED
+    events.publish_on_commit(instance.owner_id, event_type, (instance.pk,))
+
+
+def publish_bulk_note_event(sender, owner_id, created, updated, **kwargs):
+    events.publish_on_commit(owner_id, events.NOTE_SAVED, [note.pk for note in (*created, *updated)])
+
+
+def publish_category_event(sender, instance, signal, **kwargs):
+    event_type = events.CATEGORY_DELETED if signal is post_delete else events.CATEGORY_SAVED
+    events.publish_on_commit(instance.owner_id, event_type, (instance.pk,))
+
+
+def purge_tombstones(sender, instance, **kwargs):
+    Tombstone.objects.filter(owner_id=instance.pk).delete()
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def instrument_connection(sender, connection, **kwargs):
+    # The wrapper list belongs to the connection alias and survives reconnects.
+    if getattr(settings, 'METRICS', True) and metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
+    if profiling.slow_query_threshold() and profiling.log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profiling.log_slow_query)
+
+
+def check_connections(sender, **kwargs):
+    # Backport of Django 4.1's CONN_HEALTH_CHECKS: a persistent connection the
+    # server dropped is reopened instead of failing the request.
+    for connection in connections.all():
+        if connection.connection is not None and connection.settings_dict.get('CONN_HEALTH_CHECKS') \
+                and not connection.is_usable():
+            connection.close()
+
+
 post_save.connect(create_profile, sender=User)
 post_save.connect(update_user, sender=Profile)
 post_delete.connect(delete_user, sender=Profile)
+post_save.connect(reset_active_status, sender=User)
+post_delete.connect(reset_active_status, sender=User)
+post_save.connect(index_note, sender=Note)
+post_delete.connect(unindex_note, sender=Note)
+notes_bulk_saved.connect(index_bulk_notes, sender=Note)
+post_delete.connect(bury_note, sender=Note)
+post_delete.connect(bury_category, sender=Category)
+pre_delete.connect(touch_category_notes, sender=Category)
+post_delete.connect(purge_tombstones, sender=User)
+post_save.connect(invalidate_note_responses, sender=Note)
+post_delete.connect(invalidate_note_responses, sender=Note)
+notes_bulk_saved.connect(invalidate_note_responses, sender=Note)
+post_save.connect(invalidate_category_responses, sender=Category)
+post_delete.connect(invalidate_category_responses, sender=Category)
+post_save.connect(publish_note_event, sender=Note)
+post_delete.connect(publish_note_event, sender=Note)
+notes_bulk_saved.connect(publish_bulk_note_event, sender=Note)
+post_save.connect(publish_category_event, sender=Category)
+post_delete.connect(publish_category_event, sender=Category)
+connection_created.connect(configure_sqlite)
+connection_created.connect(instrument_connection)
+if django.VERSION < (4, 1):
+    request_started.connect(check_connections)
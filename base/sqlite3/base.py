@@ -0,0 +1,16 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend whose transactions start with BEGIN IMMEDIATE.
+
+    A plain (deferred) BEGIN takes the write lock at the first write, and a
+    transaction that already read cannot wait for it: SQLite fails the upgrade
+    with `database is locked` at once, ignoring busy_timeout. Taking the lock
+    up front makes concurrent writers queue on busy_timeout instead. Django
+    only opens transactions around writes here (atomic(), save(), delete()).
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
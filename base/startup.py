@@ -0,0 +1,91 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from io import BytesIO
+
+# Boot time of a fresh worker per settings module. Each run is a new
+# interpreter, as imports are cached for the life of a process; the child
+# times each phase itself and prints them as JSON.
+PHASES = ('settings', 'setup', 'handler', 'urls', 'first_request', 'total')
+PROBE_PATH = '/note_app/api'
+# Added to ALLOWED_HOSTS in the child, as the benchmark does for its client.
+PROBE_HOST = 'testserver'
+
+
+def measure() -> dict:
+    # Runs in the child process; nothing Django related is imported before.
+    started = time.perf_counter()
+    timings = {}
+
+    def mark(phase):
+        timings[phase] = (time.perf_counter() - started) - sum(timings.values())
+
+    from django.conf import settings
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, PROBE_HOST]
+    mark('settings')
+
+    import django
+    django.setup(set_prefix=False)
+    mark('setup')
+
+    from django.core.handlers.wsgi import WSGIHandler
+    handler = WSGIHandler()
+    mark('handler')
+
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    mark('urls')
+
+    status = []
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': PROBE_PATH,
+        'SERVER_NAME': PROBE_HOST,
+        'SERVER_PORT': '80',
+        'HTTP_HOST': PROBE_HOST,
+        'wsgi.input': BytesIO(),
+        'wsgi.url_scheme': 'http',
+    }
+    b''.join(handler(environ, lambda code, headers, exc_info=None: status.append(int(code.split()[0]))))
+    mark('first_request')
+
+    return {
+        'timings': {**timings, 'total': sum(timings.values())},
+        'modules': len(sys.modules),
+        'status': status[0],
+    }
+
+
+def run_once(settings_module: str) -> dict:
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+    started = time.perf_counter()
+    output = subprocess.run(
+            (sys.executable, '-c', 'import json, base.startup; print(json.dumps(base.startup.measure()))'),
+            env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - started
+    return result
+
+
+def run(settings_modules, runs: int = 5) -> dict:
+    results = {}
+    for settings_module in settings_modules:
+        samples = [run_once(settings_module) for _ in range(runs)]
+        # A failing probe request would time an error page, not the API.
+        if failed := [sample['status'] for sample in samples if sample['status'] != 200]:
+            raise ValueError(f'{settings_module}: the probe request to {PROBE_PATH} answered {failed[0]}.')
+        results[settings_module] = {
+            'runs': runs,
+            'status': samples[-1]['status'],
+            'modules': samples[-1]['modules'],
+            # Medians in milliseconds; `process` includes interpreter start-up.
+            'median_ms': {
+                phase: statistics.median(sample['timings'][phase] for sample in samples) * 1000
+                for phase in PHASES
+            } | {'process': statistics.median(sample['process'] for sample in samples) * 1000},
+        }
+    return results
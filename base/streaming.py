@@ -0,0 +1,71 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from .renderers import json_dumps
+
+# `?stream=json|ndjson` list responses, WSGI only: the rows are read from the
+# database while the response is sent, and Django's ASGI handler iterates
+# streaming responses on the event loop, where the ORM refuses to run.
+
+STREAM_QUERY_PARAM = 'stream'
+STREAM_CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 500
+
+
+def is_asgi(request) -> bool:
+    # DRF's Request wraps the Django request.
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def stream_format(request) -> str | None:
+    value = request.query_params.get(STREAM_QUERY_PARAM, '').lower()
+    if value in ('1', 'true', 'json'):
+        fmt = 'json'
+    elif value == 'ndjson':
+        fmt = 'ndjson'
+    else:
+        return None
+    if is_asgi(request):
+        raise serializers.ValidationError({STREAM_QUERY_PARAM: 'Streaming is only available under WSGI.'})
+    return fmt
+
+
+def _encode(queryset: QuerySet, serializer_class, chunk_size: int):
+    # One serializer instance is reused for every row and rows are pulled from
+    # the database in chunks, so memory stays bounded by `chunk_size`.
+    serializer = serializer_class()
+    batch = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        batch.append(json_dumps(serializer.to_representation(obj)))
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _json_array(queryset: QuerySet, serializer_class, chunk_size: int):
+    yield b'['
+    separator = b''
+    for batch in _encode(queryset, serializer_class, chunk_size):
+        yield separator + b','.join(batch)
+        separator = b','
+    yield b']'
+
+
+def _ndjson(queryset: QuerySet, serializer_class, chunk_size: int):
+    for batch in _encode(queryset, serializer_class, chunk_size):
+        yield b'\n'.join(batch) + b'\n'
+
+
+def stream_response(queryset: QuerySet, serializer_class, fmt: str = 'json',
+                    chunk_size: int = CHUNK_SIZE) -> StreamingHttpResponse:
+    generator = _ndjson if fmt == 'ndjson' else _json_array
+    return StreamingHttpResponse(
+            generator(queryset, serializer_class, chunk_size),
+            content_type=STREAM_CONTENT_TYPES[fmt]
+    )
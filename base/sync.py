@@ -0,0 +1,58 @@
+from datetime import timedelta
+from uuid import UUID
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from .models import Note, Category, Tombstone
+from .serializers import NoteSerializer, CategorySerializer
+
+SINCE_QUERY_PARAM = 'since'
+# Rows are selected from slightly before the client's watermark so writes
+# committed late by concurrent transactions are not missed; clients upsert.
+WATERMARK_OVERLAP = timedelta(seconds=5)
+# Tombstones older than this are pruned; older watermarks get a full resync.
+TOMBSTONE_RETENTION = timedelta(days=90)
+
+
+def parse_since(value: str | None):
+    if not value:
+        return None
+    try:
+        since = parse_datetime(value)
+    except ValueError:
+        since = None
+    if since is None:
+        raise serializers.ValidationError({SINCE_QUERY_PARAM: 'Expected an ISO 8601 timestamp.'})
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, timezone.utc)
+    return since
+
+
+def changes_since(owner_id: UUID, since=None) -> dict:
+    watermark = timezone.now()
+    full = since is None or since < watermark - TOMBSTONE_RETENTION
+    notes = Note.objects.filter(owner_id=owner_id)
+    categories = Category.objects.filter(owner_id=owner_id)
+    deleted = {'notes': [], 'categories': []}
+
+    if not full:
+        lower = since - WATERMARK_OVERLAP
+        notes = notes.filter(updated_at__gte=lower)
+        categories = categories.filter(updated_at__gte=lower)
+        tombstones = Tombstone.objects.filter(owner_id=owner_id, deleted_at__gte=lower)
+        for kind, object_id in tombstones.values_list('kind', 'object_id'):
+            deleted['notes' if kind == Tombstone.NOTE else 'categories'].append(object_id)
+
+    return {
+        # UTC with a 'Z' suffix so the value survives unencoded in a query string.
+        'watermark': watermark.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+        'full': full,
+        'notes': NoteSerializer(notes, many=True).data,
+        'categories': CategorySerializer(categories, many=True).data,
+        'deleted': deleted,
+    }
+
+
+def prune_tombstones(older_than: timedelta = TOMBSTONE_RETENTION) -> int:
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - older_than).delete()
+    return deleted
@@ -1,3 +1,789 @@
-from django.test import TestCase
+import json
+import random
+from base64 import urlsafe_b64encode
+from decimal import Decimal
+from io import BytesIO
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
+from uuid import UUID, uuid4
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken
+from . import benchmark, caching, metrics, profiling, routers, seed, startup
+from .authentication import (ClaimUser,
+                             DatabaseJWTAuthentication,
+                             StatelessJWTAuthentication,
+                             get_authentication)
+from .models import MyUser, Note, Category, Profile, Tombstone
+from .renderers import FastJSONParser, FastJSONRenderer, MessagePackParser, MessagePackRenderer, msgpack
+from .search import build_match_query
+from .serializers import CategorySerializer, NoteSerializer
+from .tokens import access_token_for
 
-# Create your tests here.
+
+def make_user(name: str) -> MyUser:
+    return MyUser.objects.create_user(username=name, email=f'{name}@example.com', password='secret-pw-1')
+
+
+def encode_cursor(values: list) -> str:
+    return urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+@override_settings(ROOT_URLCONF='base.urls')
+class APITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('alice')
+        self.other = make_user('bob')
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {access_token_for(self.user.pk)}'
+
+    def get(self, path: str, **extra):
+        return self.client.get(path, **extra)
+
+    def send(self, method: str, path: str, data=None, **extra):
+        return getattr(self.client, method)(path, data, content_type='application/json', **extra)
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        Note.objects.create(owner=self.user, title='Coffee order', body='Two bags of coffee beans')
+        Note.objects.create(owner=self.user, title='Groceries', body='Milk and bread')
+        Note.objects.create(owner=self.other, title='Coffee', body='coffee coffee coffee')
+
+    def test_search_is_scoped_to_owner(self):
+        response = self.get('/api/notes?search=coffee')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([note['title'] for note in response.json()], ['Coffee order'])
+
+    def test_search_returns_rank_and_snippet(self):
+        note = self.get('/api/notes?search=beans').json()[0]
+        self.assertIn('<mark>beans</mark>', note['snippet'])
+        self.assertIsInstance(note['rank'], float)
+
+    def test_title_only_match_snippets_title(self):
+        self.assertEqual(self.get('/api/notes?search=groceries').json()[0]['snippet'], '<mark>Groceries</mark>')
+
+    def test_owner_id_is_not_searchable(self):
+        for prefix in (self.user.pk.hex[:6], self.user.pk.hex):
+            with self.subTest(prefix=prefix):
+                self.assertEqual(self.get(f'/api/notes?search={prefix}').json(), [])
+
+    def test_search_follows_edits_and_deletes(self):
+        note = Note.objects.get(title='Groceries')
+        self.send('put', f'/api/notes/{note.pk}', {'title': 'Groceries', 'body': 'Oat milk'})
+        self.assertEqual(len(self.get('/api/notes?search=oat').json()), 1)
+        self.client.delete(f'/api/notes/{note.pk}')
+        self.assertEqual(self.get('/api/notes?search=oat').json(), [])
+
+    def test_match_query_pins_owner_column(self):
+        owner_id = uuid4()
+        self.assertEqual(build_match_query('tea', owner_id),
+                         f'owner_id : "{owner_id.hex}" AND {{title body}} : ("tea"*)')
+        self.assertEqual(build_match_query('"; DROP', owner_id).count('"DROP"*'), 1)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(7):
+            Note.objects.create(owner=self.user, title=f'note {index}')
+
+    def test_cursor_walks_every_note_once(self):
+        titles, url = [], '/api/notes?pagination=cursor&limit=3'
+        while url:
+            page = self.get(url).json()
+            titles += [note['title'] for note in page['results']]
+            url = page['next']
+        self.assertEqual(titles, [f'note {index}' for index in reversed(range(7))])
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.get('/api/notes?pagination=cursor&limit=3').json()
+        second = self.get(first['next']).json()
+        self.assertEqual(self.get(second['previous']).json()['results'], first['results'])
+
+    def test_count_is_optional(self):
+        self.assertEqual(self.get('/api/notes?pagination=cursor').json()['count'], 7)
+        self.assertNotIn('count', self.get('/api/notes?pagination=cursor&count=false').json())
+
+    def test_categories_page_by_cursor(self):
+        for index in range(3):
+            Category.objects.create(owner=self.user, name=f'category {index}')
+        page = self.get('/api/categories?pagination=cursor&limit=2').json()
+        self.assertEqual(len(page['results']), 2)
+        self.assertEqual(len(self.get(page['next']).json()['results']), 1)
+
+    def test_invalid_cursors_are_not_found(self):
+        note_id = str(uuid4())
+        cursors = (
+            'not-base64!',
+            encode_cursor({'a': 1}),
+            encode_cursor([0, 5, 'x']),
+            encode_cursor([0, None, None]),
+            encode_cursor([0, [1], 'x']),
+            encode_cursor([0, '2022-01-01T00:00:00', note_id]),
+            encode_cursor([0, '2022-01-01T00:00:00+00:00', 'not-a-uuid']),
+            encode_cursor([2, '2022-01-01T00:00:00+00:00', note_id]),
+        )
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.get(f'/api/notes?pagination=cursor&cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+
+    def test_ranked_search_rejects_cursor(self):
+        self.assertEqual(self.get('/api/notes?search=note&pagination=cursor').status_code, 400)
+        with override_settings(ROOT_URLCONF='base.urls_cls'):
+            self.assertEqual(self.get('/api/notes?keyword=note&pagination=cursor').status_code, 400)
+        self.assertEqual(len(self.get('/api/notes?search=note&limit=3').json()['results']), 3)
+
+
+class StreamingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(3):
+            Note.objects.create(owner=self.user, title=f'note {index}')
+
+    def test_stream_json_array(self):
+        response = self.get('/api/notes?stream=json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        notes = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([note['title'] for note in notes], ['note 2', 'note 1', 'note 0'])
+
+    def test_stream_ndjson_lines(self):
+        response = self.get('/api/notes?stream=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['note 2', 'note 1', 'note 0'])
+
+    async def test_stream_is_refused_under_asgi(self):
+        response = await self.async_client.get('/api/notes?stream=ndjson',
+                                               authorization=f'Bearer {access_token_for(self.user.pk)}')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stream', response.json())
+
+
+class AuthenticationTests(APITestCase):
+    def request_for(self, user_id):
+        token = AccessToken()
+        token['user_id'] = str(user_id)
+        return APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_stateless_mode_trusts_claim(self):
+        user, _ = StatelessJWTAuthentication().authenticate(self.request_for(self.user.pk))
+        self.assertIsInstance(user, ClaimUser)
+        self.assertEqual(user.id, self.user.pk)
+        self.assertIsInstance(user.id, UUID)
+
+    def test_claim_must_be_uuid(self):
+        with self.assertRaises(InvalidToken):
+            StatelessJWTAuthentication().authenticate(self.request_for('42'))
+
+    def test_database_mode_loads_user(self):
+        user, _ = DatabaseJWTAuthentication().authenticate(self.request_for(self.user.pk))
+        self.assertIsInstance(user, MyUser)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_inactive_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        for authentication in (StatelessJWTAuthentication(), DatabaseJWTAuthentication()):
+            with self.subTest(authentication=type(authentication).__name__), self.assertRaises(AuthenticationFailed):
+                authentication.authenticate(self.request_for(self.user.pk))
+
+    def test_mode_setting_picks_authentication(self):
+        with override_settings(JWT_AUTH_MODE='stateless'):
+            self.assertIsInstance(get_authentication(), StatelessJWTAuthentication)
+        with override_settings(JWT_AUTH_MODE='database'):
+            self.assertIsInstance(get_authentication(), DatabaseJWTAuthentication)
+
+
+class BulkTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(owner=self.user, name='mine')
+        self.foreign_category = Category.objects.create(owner=self.other, name='theirs')
+        self.note = Note.objects.create(owner=self.user, title='note', category=self.category)
+        self.foreign_note = Note.objects.create(owner=self.other, title='foreign')
+
+    def bulk(self, payload: dict):
+        return self.send('post', '/api/notes/bulk', payload)
+
+    def test_create_reports_each_item(self):
+        response = self.bulk({'create': [
+            {'title': 'one', 'category': str(self.category.pk)},
+            {'body': 'no title'},
+            {'title': 'two', 'category': str(self.foreign_category.pk)},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['status'] for item in response.json()['create']], [201, 400, 400])
+        self.assertIn('category', response.json()['create'][2]['errors'])
+        self.assertEqual(set(Note.objects.filter(owner=self.user).values_list('title', flat=True)), {'note', 'one'})
+
+    def test_update_rejects_foreign_notes_and_categories(self):
+        response = self.bulk({'update': [
+            {'id': str(self.note.pk), 'category': str(self.foreign_category.pk)},
+            {'id': str(self.foreign_note.pk), 'title': 'taken'},
+            {'id': 'nope'},
+        ]})
+        self.assertEqual([item['status'] for item in response.json()['update']], [400, 404, 400])
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.category_id, self.category.pk)
+        self.assertEqual(Note.objects.get(pk=self.foreign_note.pk).title, 'foreign')
+
+    def test_move_pin_and_delete(self):
+        other_category = Category.objects.create(owner=self.user, name='other')
+        doomed = Note.objects.create(owner=self.user, title='doomed')
+        response = self.bulk({
+            'move': {'category': str(other_category.pk), 'notes': [str(self.note.pk)]},
+            'pin': [str(self.note.pk), str(self.foreign_note.pk)],
+            'delete': [str(doomed.pk)],
+        })
+        self.assertEqual([item['status'] for item in response.json()['pin']], [200, 404])
+        self.assertEqual(response.json()['delete'][0]['status'], 204)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.category_id, self.note.is_pinned), (other_category.pk, True))
+        self.assertFalse(Note.objects.filter(pk=doomed.pk).exists())
+
+    def test_move_needs_explicit_category(self):
+        response = self.bulk({'move': {'notes': [str(self.note.pk)]}})
+        self.assertEqual(response.json()['move'][0]['status'], 400)
+        self.assertIn('category', response.json()['move'][0]['errors'])
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.category_id, self.category.pk)
+
+        self.bulk({'move': {'category': None, 'notes': [str(self.note.pk)]}})
+        self.note.refresh_from_db()
+        self.assertIsNone(self.note.category_id)
+
+    def test_move_to_foreign_category_fails(self):
+        response = self.bulk({'move': {'category': str(self.foreign_category.pk), 'notes': [str(self.note.pk)]}})
+        self.assertEqual(response.json()['move'][0]['status'], 400)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.category_id, self.category.pk)
+
+    def test_single_writes_reject_foreign_categories(self):
+        foreign = {'title': 'note', 'category': str(self.foreign_category.pk)}
+        for urlconf in ('base.urls', 'base.urls_cls'):
+            with self.subTest(urlconf=urlconf), override_settings(ROOT_URLCONF=urlconf):
+                self.assertEqual(self.send('post', '/api/notes', foreign).status_code, 400)
+                self.assertNotEqual(self.send('put', f'/api/notes/{self.note.pk}', foreign).status_code, 200)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.category_id, self.category.pk)
+        self.assertFalse(Note.objects.filter(category=self.foreign_category).exists())
+
+
+class SyncTests(APITestCase):
+    def test_full_then_delta_sync(self):
+        kept = Note.objects.create(owner=self.user, title='kept')
+        deleted = Note.objects.create(owner=self.user, title='deleted')
+        Note.objects.create(owner=self.other, title='foreign')
+
+        full = self.get('/api/sync').json()
+        self.assertTrue(full['full'])
+        self.assertEqual({note['title'] for note in full['notes']}, {'kept', 'deleted'})
+
+        self.client.delete(f'/api/notes/{deleted.pk}')
+        delta = self.get(f'/api/sync?since={full["watermark"]}').json()
+        self.assertFalse(delta['full'])
+        self.assertEqual(delta['deleted']['notes'], [str(deleted.pk)])
+        self.assertNotIn(str(deleted.pk), {note['id'] for note in delta['notes']})
+        self.assertIn(str(kept.pk), {note['id'] for note in full['notes']})
+
+    def test_invalid_since(self):
+        self.assertEqual(self.get('/api/sync?since=yesterday').status_code, 400)
+
+    def test_bulk_delete_leaves_tombstone(self):
+        note = Note.objects.create(owner=self.user, title='doomed')
+        self.send('post', '/api/notes/bulk', {'delete': [str(note.pk)]})
+        self.assertTrue(Tombstone.objects.filter(object_id=note.pk, kind=Tombstone.NOTE).exists())
+
+
+class ConditionalRequestTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.note = Note.objects.create(owner=self.user, title='first')
+
+    def test_list_not_modified(self):
+        etag = self.get('/api/notes')['ETag']
+        self.assertEqual(self.get('/api/notes', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_single_note_etag_changes_on_edit(self):
+        etag = self.get(f'/api/notes/{self.note.pk}')['ETag']
+        self.send('put', f'/api/notes/{self.note.pk}', {'title': 'edited'})
+        response = self.get(f'/api/notes/{self.note.pk}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'edited')
+
+    def test_list_etag_changes_on_delete(self):
+        Note.objects.create(owner=self.user, title='second')
+        etag = self.get('/api/notes')['ETag']
+        self.client.delete(f'/api/notes/{self.note.pk}')
+        self.assertEqual(self.get('/api/notes', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since_alone_is_not_enough(self):
+        for path in ('/api/notes', f'/api/notes/{self.note.pk}'):
+            with self.subTest(path=path):
+                last_modified = self.get(path)['Last-Modified']
+                # An edit in the same second keeps the Last-Modified value.
+                Note.objects.filter(pk=self.note.pk).update(title='edited')
+                response = self.get(path, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, 200)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.note = Note.objects.create(owner=self.user, title='first')
+
+    def test_response_cache_off_on_local_memory_cache(self):
+        self.assertEqual(caching.get_timeout(), 0)
+        with override_settings(RESPONSE_CACHE_SINGLE_PROCESS=True):
+            self.assertGreater(caching.get_timeout(), 0)
+
+    @override_settings(RESPONSE_CACHE_SINGLE_PROCESS=True)
+    def test_response_cache_invalidated_by_writes(self):
+        self.get('/api/notes')
+        # TestCase never commits, so this write does not invalidate the cache.
+        Note.objects.create(owner=self.user, title='uncommitted')
+        self.assertEqual([note['title'] for note in self.get('/api/notes').json()], ['first'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.send('post', '/api/notes', {'title': 'second'})
+        self.assertEqual([note['title'] for note in self.get('/api/notes').json()], ['second', 'uncommitted', 'first'])
+
+    @override_settings(RESPONSE_CACHE_SINGLE_PROCESS=True)
+    def test_response_cache_is_per_user(self):
+        self.get('/api/notes')
+        other = self.get('/api/notes', HTTP_AUTHORIZATION=f'Bearer {access_token_for(self.other.pk)}')
+        self.assertEqual(other.json(), [])
+
+
+class ProfileSyncTests(APITestCase):
+    def test_new_user_gets_matching_profile(self):
+        profile = Profile.objects.get(owner=self.user)
+        self.assertEqual((profile.username, profile.email), ('alice', 'alice@example.com'))
+
+    def test_profile_edit_updates_user(self):
+        password = self.user.password
+        data = {'first_name': 'Alice', 'username': 'alice', 'owner': str(self.user.pk)}
+        response = self.send('put', '/api/profile', data)
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Alice')
+        self.assertEqual(self.user.password, password)
+
+    def test_unchanged_profile_save_writes_nothing(self):
+        profile = Profile.objects.get(owner=self.user)
+        with self.assertNumQueries(0):
+            profile.save()
+
+    def test_profile_save_writes_changed_columns(self):
+        profile = Profile.objects.get(owner=self.user)
+        profile.last_name = 'Liddell'
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertIn('"last_name"', updates[0])
+        self.assertNotIn('"email"', updates[0])
+        self.assertEqual(MyUser.objects.get(pk=self.user.pk).last_name, 'Liddell')
+
+
+@override_settings(ROOT_URLCONF='base.urls_async')
+class AsyncViewTests(APITestCase):
+    async def arequest(self, method: str, path: str, data=None, **extra):
+        # AsyncClient only sends headers passed with each request.
+        extra.setdefault('authorization', f'Bearer {access_token_for(self.user.pk)}')
+        if data is not None:
+            extra.update(data=data, content_type=extra.get('content_type', 'application/json'))
+        return await getattr(self.async_client, method)(path, **extra)
+
+    async def test_list_and_create(self):
+        response = await self.arequest('post', '/api/notes', {'title': 'async'})
+        self.assertEqual(response.status_code, 201)
+        response = await self.arequest('get', '/api/notes')
+        self.assertEqual([note['title'] for note in response.json()], ['async'])
+
+    async def test_requires_token(self):
+        response = await self.async_client.get('/api/notes')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_single_note_not_modified(self):
+        response = await self.arequest('post', '/api/notes', {'title': 'async'})
+        path = f'/api/notes/{response.json()["id"]}'
+        etag = (await self.arequest('get', path))['ETag']
+        self.assertEqual((await self.arequest('get', path, if_none_match=etag)).status_code, 304)
+
+    async def test_other_users_notes_not_found(self):
+        note = await sync_to_async(Note.objects.create)(owner=self.other, title='foreign')
+        self.assertEqual((await self.arequest('get', f'/api/notes/{note.pk}')).status_code, 404)
+
+    @override_settings(JWT_AUTH_MODE='database')
+    async def test_database_mode_rejects_inactive_user(self):
+        self.assertEqual((await self.arequest('get', '/api/notes')).status_code, 200)
+        await sync_to_async(MyUser.objects.filter(pk=self.user.pk).update)(is_active=False)
+        self.assertEqual((await self.arequest('get', '/api/notes')).status_code, 401)
+
+    async def test_routes_list_every_endpoint(self):
+        routes = (await self.async_client.get('/api')).json().values()
+        self.assertIn('/note_app/api/notes/bulk', routes)
+        self.assertIn('/note_app/api/sync?since=<watermark>', routes)
+
+    async def test_body_parsers_are_negotiated(self):
+        response = await self.async_client.post('/api/notes', {'title': 'form'},
+                                                authorization=f'Bearer {access_token_for(self.user.pk)}')
+        self.assertEqual(response.status_code, 201)
+        response = await self.arequest('post', '/api/notes', data='{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = await self.arequest('post', '/api/notes', data='title', content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+
+    async def test_foreign_category_rejected(self):
+        category = await sync_to_async(Category.objects.create)(owner=self.other, name='theirs')
+        response = await self.arequest('post', '/api/notes', {'title': 'async', 'category': str(category.pk)})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(EVENT_STREAM_MAX_AGE=0)
+class EventTests(APITestCase):
+    def create_note(self, title: str) -> Note:
+        with self.captureOnCommitCallbacks(execute=True):
+            return Note.objects.create(owner=self.user, title=title)
+
+    def test_long_poll_returns_new_events(self):
+        last_event_id = self.get('/api/events?timeout=0').json()['last_event_id']
+        note = self.create_note('event')
+        poll = self.get(f'/api/events?after={last_event_id}&timeout=0').json()
+        self.assertFalse(poll['reset'])
+        self.assertEqual([(event['type'], event['ids']) for event in poll['events']],
+                         [('note.saved', [str(note.pk)])])
+
+        empty = self.get(f'/api/events?after={poll["last_event_id"]}&timeout=0').json()
+        self.assertEqual(empty['events'], [])
+
+    def test_long_poll_ignores_other_users(self):
+        last_event_id = self.get('/api/events?timeout=0').json()['last_event_id']
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.create(owner=self.other, title='not mine')
+        self.assertEqual(self.get(f'/api/events?after={last_event_id}&timeout=0').json()['events'], [])
+
+    def test_stream_replays_after_last_event_id(self):
+        last_event_id = self.get('/api/events?timeout=0').json()['last_event_id']
+        note = self.create_note('streamed')
+        response = self.get('/api/events/stream', HTTP_LAST_EVENT_ID=str(last_event_id))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn('event: note.saved', body)
+        self.assertIn(str(note.pk), body)
+
+    def test_invalid_poll_parameters(self):
+        self.assertEqual(self.get('/api/events?after=soon').status_code, 400)
+
+    async def test_stream_is_refused_under_asgi(self):
+        authorization = f'Bearer {access_token_for(self.user.pk)}'
+        response = await self.async_client.get('/api/events/stream', authorization=authorization)
+        self.assertEqual(response.status_code, 400)
+        with override_settings(ROOT_URLCONF='base.urls_async'):
+            response = await self.async_client.get('/api/events?timeout=0', authorization=authorization)
+        self.assertEqual(response.status_code, 200)
+
+
+class RendererTests(APITestCase):
+    def test_fast_json_matches_drf_output(self):
+        data = {'id': uuid4(), 'amount': Decimal('1.50'), 'label': gettext_lazy('Notes'), 'text': 'a\u2028b', 1: None}
+        content = FastJSONRenderer().render(data)
+        self.assertEqual(json.loads(content), json.loads(JSONRenderer().render(data)))
+        self.assertIn(b'\\u2028', content)
+
+    def test_indented_output_uses_drf(self):
+        content = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2', {})
+        self.assertEqual(content, b'{\n  "a": 1\n}')
+
+    def test_fast_json_parser(self):
+        self.assertEqual(FastJSONParser().parse(BytesIO(b'{"title": "t"}')), {'title': 't'})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{'))
+
+    def test_api_speaks_json(self):
+        response = self.send('post', '/api/notes', {'title': 'rendered'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['title'], 'rendered')
+        self.assertEqual(self.get('/api/notes', HTTP_ACCEPT='text/html').status_code, 200)
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_message_pack_round_trip(self):
+        content = MessagePackRenderer().render({'id': uuid4(), 'title': 'packed'})
+        self.assertEqual(MessagePackParser().parse(BytesIO(content))['title'], 'packed')
+
+
+class RowSerializerTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(owner=self.user, name='mine')
+        Note.objects.create(owner=self.user, title='first', body='one', category=self.category)
+        Note.objects.create(owner=self.user, title='second', is_pinned=True)
+
+    def test_rows_match_model_serializer(self):
+        notes = NoteSerializer(Note.objects.filter(owner=self.user), many=True).data
+        expected = json.loads(JSONRenderer().render(notes))
+        self.assertEqual(self.get('/api/notes').json(), expected)
+        with override_settings(ROOT_URLCONF='base.urls_cls'):
+            self.assertEqual(self.get('/api/notes').json()['results'], expected)
+
+    def test_category_rows_match_model_serializer(self):
+        expected = json.loads(JSONRenderer().render(CategorySerializer(self.category).data))
+        self.assertEqual(self.get(f'/api/categories/{self.category.pk}').json(), expected)
+        listed = self.get('/api/categories').json()[0]
+        self.assertEqual({name: listed[name] for name in expected}, expected)
+
+
+class RowSelectionTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        Note.objects.create(owner=self.user, title='long', body='abcdefghijklmnop')
+
+    def test_fields_selects_columns(self):
+        note = self.get('/api/notes?fields=title').json()[0]
+        self.assertEqual(set(note), {'id', 'title'})
+
+    def test_unknown_field(self):
+        self.assertEqual(self.get('/api/notes?fields=title,secret').status_code, 400)
+
+    def test_body_can_be_left_out(self):
+        note = self.get('/api/notes?body=false').json()[0]
+        self.assertNotIn('body', note)
+        self.assertEqual(note['title'], 'long')
+
+    def test_preview_cuts_body(self):
+        self.assertEqual(self.get('/api/notes?preview=5').json()[0]['body'], 'abcde')
+        self.assertEqual(self.get('/api/notes?preview=0').status_code, 400)
+
+    def test_cursor_pages_with_field_selection(self):
+        Note.objects.create(owner=self.user, title='short')
+        page = self.get('/api/notes?fields=title&pagination=cursor&limit=1').json()
+        self.assertEqual(self.get(page['next']).json()['results'], [{'id': str(Note.objects.get(title='long').pk),
+                                                                     'title': 'long'}])
+
+
+class CategoryStatsTests(APITestCase):
+    def test_stats_count_category_notes(self):
+        category = Category.objects.create(owner=self.user, name='mine')
+        Category.objects.create(owner=self.user, name='empty')
+        Note.objects.create(owner=self.user, title='one', category=category)
+        latest = Note.objects.create(owner=self.user, title='two', category=category, is_pinned=True)
+        Note.objects.create(owner=self.user, title='loose')
+        stats = {category['name']: category for category in self.get('/api/categories').json()}
+        self.assertEqual((stats['mine']['note_count'], stats['mine']['pinned_count']), (2, 1))
+        self.assertEqual(parse_datetime(stats['mine']['last_note_updated_at']), latest.updated_at)
+        self.assertEqual((stats['empty']['note_count'], stats['empty']['last_note_updated_at']), (0, None))
+
+    def test_foreign_notes_cannot_join_category(self):
+        category = Category.objects.create(owner=self.user, name='mine')
+        response = self.send('post', '/api/notes', {'title': 'intruder', 'category': str(category.pk)},
+                             HTTP_AUTHORIZATION=f'Bearer {access_token_for(self.other.pk)}')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get('/api/categories').json()[0]['note_count'], 0)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite backend')
+class SQLiteBackendTests(TransactionTestCase):
+    def test_transactions_take_the_write_lock(self):
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            MyUser.objects.count()
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = routers.ReplicaRouter()
+
+    def route(self, primary: bool = False, user=None) -> str:
+        request = SimpleNamespace(user=user) if user else SimpleNamespace()
+        token = routers.begin_request(request, primary)
+        try:
+            return self.router.db_for_read(Note)
+        finally:
+            routers.end_request(token)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Note), 'default')
+        self.assertEqual(self.router.db_for_write(Note), 'default')
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.route(), 'replica1')
+        self.assertEqual(self.route(primary=True), 'default')
+
+    def test_user_who_wrote_recently_reads_primary(self):
+        user = ClaimUser({'user_id': str(uuid4())})
+        self.assertEqual(self.route(user=user), 'replica1')
+        routers.remember_write(user.id)
+        self.assertEqual(self.route(user=user), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'base'))
+        self.assertTrue(self.router.allow_migrate('default', 'base'))
+
+
+class ReplicaStickinessTests(APITestCase):
+    def test_only_authenticated_writes_stick(self):
+        self.assertNotIn(routers.STICKY_COOKIE, self.get('/api/notes').cookies)
+        self.assertIn(routers.STICKY_COOKIE, self.send('post', '/api/notes', {'title': 'written'}).cookies)
+        self.assertTrue(routers.wrote_recently(self.user.pk))
+
+        login = {'email': 'bob@example.com', 'password': 'secret-pw-1'}
+        response = self.client.post('/api/token/login', login, content_type='application/json', HTTP_AUTHORIZATION='')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+        self.assertFalse(routers.wrote_recently(self.other.pk))
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dataset = seed.seed(users=4, notes=40, categories_per_user=2, batch_size=16)
+
+    def test_seed_is_reproducible(self):
+        self.assertEqual(self.dataset, {'users': 4, 'categories': 8, 'notes': 40})
+        notes = list(Note.objects.order_by('id').values_list('id', 'title'))
+        Note.objects.all().delete()
+        MyUser.objects.all().delete()
+        seed.seed(users=4, notes=40, categories_per_user=2, batch_size=16)
+        self.assertEqual(list(Note.objects.order_by('id').values_list('id', 'title')), notes)
+
+    def test_bulk_create_with_profiles(self):
+        users = [MyUser(username=f'bulk{index}', email=f'bulk{index}@example.com', first_name='Bulk')
+                 for index in range(3)]
+        MyUser.objects.bulk_create_with_profiles(users, batch_size=2)
+        profiles = Profile.objects.filter(owner__username__startswith='bulk')
+        self.assertEqual(sorted(profiles.values_list('username', 'email', 'first_name')),
+                         [(f'bulk{index}', f'bulk{index}@example.com', 'Bulk') for index in range(3)])
+
+    def test_run_leaves_dataset_unchanged(self):
+        results = benchmark.run(requests=5, warmup=1, users=4)
+        self.assertEqual(len(results['results']), len(benchmark.URL_SETS) * len(benchmark.SCENARIOS))
+        self.assertEqual([result for result in results['results'] if result['errors']], [])
+        self.assertEqual(results['meta']['dataset'], {'users': 4, 'notes': 40, 'categories': 8})
+        self.assertEqual(Note.objects.count(), 40)
+
+    def test_deleted_notes_are_not_taken_again(self):
+        users = list(MyUser.objects.all())
+        ctx = benchmark.Context(None, random.Random(1), users, benchmark.note_ids_for(users), 'search')
+        taken = [ctx.take_note()[1] for _ in range(40)]
+        self.assertEqual(len(set(taken)), 40)
+        with self.assertRaises(ValueError):
+            ctx.take_note()
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+
+    def scrape(self, **extra):
+        return metrics.scrape(RequestFactory().get('/metrics', **extra))
+
+    def test_server_timing_header(self):
+        Note.objects.create(owner=self.user, title='timed')
+        timing = self.get('/api/notes')['Server-Timing']
+        self.assertIn('queries;desc="', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    @override_settings(DEBUG=True)
+    def test_exposition_counts_requests(self):
+        self.get('/api/notes')
+        self.get('/api/notes')
+        content = self.scrape().content.decode()
+        self.assertIn('api_requests_total{method="GET",route="api/notes",status="200"} 2', content)
+        self.assertIn('# TYPE api_request_duration_seconds histogram', content)
+
+    def test_scrape_access(self):
+        self.assertEqual(self.scrape().status_code, 404)
+        with override_settings(METRICS_TOKEN='scraper'):
+            self.assertEqual(self.scrape().status_code, 401)
+            self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer scraper').status_code, 200)
+
+    def test_repeated_queries_are_flagged(self):
+        category = Category.objects.create(owner=self.user, name='mine')
+        for index in range(6):
+            Note.objects.create(owner=self.user, title=f'note {index}', category=category)
+        token = metrics.begin()
+        try:
+            for note in Note.objects.filter(owner=self.user):
+                note.category.name
+            repeated = metrics.current().repeated_queries()
+        finally:
+            metrics.end(token)
+        self.assertEqual([count for _, count in repeated], [6])
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        profile_dir = override_settings(PROFILE_DIR=directory.name)
+        profile_dir.enable()
+        self.addCleanup(profile_dir.disable)
+        self.admin = MyUser.objects.create_user(username='admin', email='admin@example.com',
+                                                password='secret-pw-1', is_staff=True)
+        self.admin_token = f'Bearer {access_token_for(self.admin.pk)}'
+
+    def test_admin_request_is_profiled(self):
+        response = self.get('/api/notes', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=self.admin_token)
+        profile_id = response[profiling.PROFILE_ID_HEADER]
+        listed = profiling.profile_list(RequestFactory().get('/profiles', HTTP_AUTHORIZATION=self.admin_token))
+        self.assertEqual([profile['id'] for profile in json.loads(listed.content)['results']], [profile_id])
+        text = profiling.profile_download(RequestFactory().get('/profiles', {'format': 'text'},
+                                                               HTTP_AUTHORIZATION=self.admin_token), profile_id)
+        self.assertIn('function calls', text.content.decode())
+
+    def test_other_users_cannot_profile(self):
+        response = self.get('/api/notes', HTTP_X_PROFILE='1')
+        self.assertNotIn(profiling.PROFILE_ID_HEADER, response)
+        request = RequestFactory().get('/profiles', HTTP_AUTHORIZATION=f'Bearer {access_token_for(self.user.pk)}')
+        with self.assertRaises(Http404):
+            profiling.profile_list(request)
+
+    def slow_query(self):
+        with connection.execute_wrapper(profiling.log_slow_query):
+            list(Note.objects.filter(owner=self.user))
+        return profiling.slow_queries()[0]
+
+    @override_settings(SLOW_QUERY_MS=0.000001)
+    def test_slow_queries_are_logged(self):
+        with self.assertLogs('base.slow_queries', 'WARNING'):
+            entry = self.slow_query()
+        self.assertIn('base_note', entry['sql'])
+        self.assertIsNone(entry['plan'])
+
+    @override_settings(SLOW_QUERY_MS=0.000001, SLOW_QUERY_EXPLAIN=True)
+    def test_explain_is_opt_in(self):
+        with self.assertLogs('base.slow_queries', 'WARNING'):
+            self.assertTrue(self.slow_query()['plan'])
+
+
+class StartupTests(SimpleTestCase):
+    def test_probe_reaches_the_api(self):
+        result = startup.run(['not_api.settings_api'], runs=1)['not_api.settings_api']
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(set(result['median_ms']), {*startup.PHASES, 'process'})
+
+    def test_failed_probe_fails_the_run(self):
+        sample = {'status': 400, 'modules': 1, 'process': 0, 'timings': dict.fromkeys(startup.PHASES, 0)}
+        with patch.object(startup, 'run_once', return_value=sample), self.assertRaises(ValueError):
+            startup.run(['not_api.settings'], runs=1)
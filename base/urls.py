@@ -11,8 +11,12 @@ urlpatterns = [
     path('api/users', views.create_user, name='create_user'),
     path('api/profile', views.profile_handler, name='profile'),
     path('api/notes', views.note_list, name='notes'),
-    path('api/notes/<str:note_id>', views.single_note, name='note'),
+    path('api/notes/bulk', views.note_bulk, name='note_bulk'),
+    path('api/notes/<uuid:note_id>', views.single_note, name='note'),
     path('api/categories', views.category_list, name='categories'),
-    path('api/categories/<str:category_id>', views.single_category, name='category'),
-    path('api/categories/<str:category_id>/notes', views.category_notes, name='category_notes'),
+    path('api/categories/<uuid:category_id>', views.single_category, name='category'),
+    path('api/categories/<uuid:category_id>/notes', views.category_notes, name='category_notes'),
+    path('api/sync', views.sync_changes, name='sync'),
+    path('api/events', views.note_events, name='events'),
+    path('api/events/stream', views.event_stream, name='event_stream'),
 ]
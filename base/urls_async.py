@@ -0,0 +1,21 @@
+from django.urls import path
+from . import views, views_async
+from rest_framework_simplejwt.views import TokenRefreshView
+
+app_name = 'base'
+
+urlpatterns = [
+    path('api', views_async.get_routes, name='routes'),
+    path('api/token/login', views.MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/login/refresh', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/users', views.create_user, name='create_user'),
+    path('api/profile', views_async.profile_handler, name='profile'),
+    path('api/notes', views_async.note_list, name='notes'),
+    path('api/notes/bulk', views.note_bulk, name='note_bulk'),
+    path('api/notes/<uuid:note_id>', views_async.single_note, name='note'),
+    path('api/categories', views_async.category_list, name='categories'),
+    path('api/categories/<uuid:category_id>', views_async.single_category, name='category'),
+    path('api/categories/<uuid:category_id>/notes', views_async.category_notes, name='category_notes'),
+    path('api/sync', views.sync_changes, name='sync'),
+    path('api/events', views_async.note_events, name='events'),
+]
@@ -8,6 +8,8 @@ router.register('users', views_cls.UserViewSet, basename='users')
 router.register('profile', views_cls.ProfileViewSet, basename='profile')
 router.register('notes', views_cls.NotesViewSet, basename='notes')
 router.register('categories', views_cls.CategoriesViewSet, basename='categories')
+router.register('sync', views_cls.SyncViewSet, basename='sync')
+router.register('events', views_cls.EventsViewSet, basename='events')
 
 app_name = 'base'
 
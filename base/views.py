@@ -1,15 +1,27 @@
+from uuid import UUID
 from django.db import IntegrityError
 from django.db.models import Q
 from django.http.request import HttpRequest
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth import get_user_model
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Note, Category
+from . import bulk, events, sync
+from .caching import NOTES, CATEGORIES, cache_response
+from .conditional import collection_validators, not_modified, object_validators, with_validators
+from .models import Note, Category, Profile
+from .pagination import SwitchableResultsSetPagination, pagination_requested
+from .renderers import FastJSONRenderer
+from .rows import request_row_serializer
+from .search import search_notes
+from .streaming import stream_format, stream_response
+from .tokens import token_requested
 from .serializers import (NoteSerializer,
+                          NoteSearchSerializer,
                           CategorySerializer,
+                          CategoryStatsSerializer,
                           ProfileSerializer,
                           UserSerializer,
                           MyTokenObtainPairSerializer)
@@ -23,6 +35,24 @@ class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
 
 
+def list_response(request: HttpRequest, queryset, serializer_class):
+    # Unpaged by default for backwards compatibility; `limit`/`offset`/`cursor`
+    # page like the class-based views and `stream=json|ndjson` streams rows.
+    serializer_class = request_row_serializer(request, serializer_class)
+    queryset = serializer_class.values(queryset)
+    if fmt := stream_format(request):
+        return stream_response(queryset, serializer_class, fmt)
+
+    if pagination_requested(request):
+        paginator = SwitchableResultsSetPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    serializer = serializer_class(queryset, many=True)
+    return Response(serializer.data)
+
+
 @api_view(('GET',))
 def get_routes(request: HttpRequest) -> Response:
     routes = {
@@ -32,10 +62,14 @@ def get_routes(request: HttpRequest) -> Response:
         'login_refresh': '/note_app/api/token/login/refresh',
         'profile': '/note_app/api/profile',
         'the user\'s all notes': '/note_app/api/notes',
-        'the user\'s single note': '/note_app/api/notes/<str:note_id>',
+        'the user\'s notes in bulk': '/note_app/api/notes/bulk',
+        'the user\'s single note': '/note_app/api/notes/<uuid:note_id>',
         'the user\'s all categories': '/note_app/api/categories',
-        'the user\'s single category': '/note_app/api/categories/<str:category_id>',
-        'the user\'s single category\'s notes': '/note_app/api/categories/<str:category_id>/notes',
+        'the user\'s single category': '/note_app/api/categories/<uuid:category_id>',
+        'the user\'s single category\'s notes': '/note_app/api/categories/<uuid:category_id>/notes',
+        'the user\'s changes since a watermark': '/note_app/api/sync?since=<watermark>',
+        'the user\'s change events (long-poll)': '/note_app/api/events?after=<event_id>',
+        'the user\'s change events (server-sent)': '/note_app/api/events/stream',
     }
 
     return Response(routes)
@@ -43,53 +77,61 @@ def get_routes(request: HttpRequest) -> Response:
 
 @api_view(('GET', 'POST'))
 @permission_classes((IsAuthenticated,))
+@cache_response(NOTES)
 def note_list(request: HttpRequest) -> Response:
     try:
-        notes = Note.objects.filter(owner=request.user)
+        notes = Note.objects.filter(owner_id=request.user.id)
     except Note.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
+        validators = collection_validators(request, request.user.id, Note)
+        if response := not_modified(request, *validators):
+            return response
+
+        serializer_class = NoteSerializer
         if params := request.query_params:
             if search := params.get('search', default=None):
-                notes = notes.filter(
-                        Q(title__icontains=search)
-                        | Q(body__icontains=search)
-                )
+                notes = search_notes(notes, search, request.user.id)
+                serializer_class = NoteSearchSerializer
             if pin := params.get('pin', default=None):
                 notes = notes.filter(
                         Q(is_pinned__exact=pin.capitalize())
                 )
-        serializer = NoteSerializer(notes, many=True)
-        return Response(serializer.data)
+        return with_validators(list_response(request, notes, serializer_class), *validators)
 
     if request.method == 'POST':
-        serializer = NoteSerializer(data=request.data, many=False)
+        serializer = NoteSerializer(data=request.data, many=False, context={'request': request})
         if serializer.is_valid():
-            print(request.data)
-            serializer.save(owner=request.user)
+            serializer.save(owner_id=request.user.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(('POST',))
+@permission_classes((IsAuthenticated,))
+def note_bulk(request: HttpRequest) -> Response:
+    return Response(bulk.apply(request.user.id, request.data))
+
+
 @api_view(('GET', 'PUT', 'DELETE'))
 @permission_classes((IsAuthenticated,))
-def single_note(request: HttpRequest, note_id: str) -> Response:
+def single_note(request: HttpRequest, note_id: UUID) -> Response:
     try:
-        note = Note.objects.get(pk=note_id)
+        note = Note.objects.get(pk=note_id, owner_id=request.user.id)
     except Note.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    if note.owner != request.user:
-        return Response(status=status.HTTP_401_UNAUTHORIZED)
-
     if request.method == 'GET':
+        validators = object_validators(request, note)
+        if response := not_modified(request, *validators):
+            return response
         serializer = NoteSerializer(note, many=False)
-        return Response(serializer.data)
+        return with_validators(Response(serializer.data), *validators)
 
     if request.method == 'PUT':
-        serializer = NoteSerializer(note, data=request.data, many=False)
+        serializer = NoteSerializer(note, data=request.data, many=False, context={'request': request})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -102,44 +144,50 @@ def single_note(request: HttpRequest, note_id: str) -> Response:
 
 @api_view(('GET', 'POST'))
 @permission_classes((IsAuthenticated,))
+@cache_response(CATEGORIES, NOTES)
 def category_list(request: HttpRequest) -> Response:
     try:
-        categories = Category.objects.filter(owner=request.user)
+        categories = Category.objects.filter(owner_id=request.user.id)
     except Category.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
+        # Note counts make the list depend on the user's notes as well.
+        validators = collection_validators(request, request.user.id, Category, Note)
+        if response := not_modified(request, *validators):
+            return response
+
         if params := request.query_params:
             if name := params.get('name', default=None):
                 categories = categories.filter(
                         Q(name__icontains=name)
                 )
 
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data)
+        categories = categories.with_note_stats()
+        return with_validators(list_response(request, categories, CategoryStatsSerializer), *validators)
 
     if request.method == 'POST':
         serializer = CategorySerializer(data=request.data, many=False)
         if serializer.is_valid():
-            serializer.save(owner=request.user)
+            serializer.save(owner_id=request.user.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(('GET', 'PUT', 'DELETE'))
 @permission_classes((IsAuthenticated,))
-def single_category(request: HttpRequest, category_id: str):
+def single_category(request: HttpRequest, category_id: UUID):
     try:
-        category = Category.objects.get(pk=category_id)
+        category = Category.objects.get(pk=category_id, owner_id=request.user.id)
     except Category.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    if category.owner != request.user:
-        return Response(status=status.HTTP_401_UNAUTHORIZED)
-
     if request.method == 'GET':
+        validators = object_validators(request, category)
+        if response := not_modified(request, *validators):
+            return response
         serializer = CategorySerializer(category, many=False)
-        return Response(serializer.data)
+        return with_validators(Response(serializer.data), *validators)
 
     if request.method == 'PUT':
         serializer = CategorySerializer(category, data=request.data, many=False)
@@ -155,22 +203,37 @@ def single_category(request: HttpRequest, category_id: str):
 
 @api_view(('GET',))
 @permission_classes((IsAuthenticated,))
-def category_notes(request: HttpRequest, category_id: str) -> Response:
-    try:
-        category = Category.objects.get(pk=category_id)
-    except Category.DoesNotExist:
+def category_notes(request: HttpRequest, category_id: UUID) -> Response:
+    if not Category.objects.filter(pk=category_id, owner_id=request.user.id).exists():
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    if category.owner != request.user:
-        return Response(status=status.HTTP_401_UNAUTHORIZED)
+    validators = collection_validators(request, request.user.id, Note)
+    if response := not_modified(request, *validators):
+        return response
 
-    try:
-        notes = category.note_set.filter(owner=request.user)
-    except Note.DoesNotExist:
-        return Response(status=status.HTTP_404_NOT_FOUND)
+    notes = Note.objects.filter(category_id=category_id, owner_id=request.user.id)
+    return with_validators(list_response(request, notes, NoteSerializer), *validators)
 
-    serializer = NoteSerializer(notes, many=True)
-    return Response(serializer.data)
+
+@api_view(('GET',))
+@permission_classes((IsAuthenticated,))
+def sync_changes(request: HttpRequest) -> Response:
+    since = sync.parse_since(request.query_params.get(sync.SINCE_QUERY_PARAM))
+    return Response(sync.changes_since(request.user.id, since))
+
+
+@api_view(('GET',))
+@permission_classes((IsAuthenticated,))
+def note_events(request: HttpRequest) -> Response:
+    after, timeout = events.parse_poll(request.query_params)
+    return Response(events.poll(request.user.id, after, timeout))
+
+
+@api_view(('GET',))
+@renderer_classes((FastJSONRenderer, events.EventStreamRenderer))
+@permission_classes((IsAuthenticated,))
+def event_stream(request: HttpRequest):
+    return events.stream_response(request)
 
 
 @api_view(('POST',))
@@ -198,19 +261,22 @@ def create_user(request: HttpRequest) -> Response:
 @api_view(('GET', 'PUT', 'DELETE'))
 @permission_classes((IsAuthenticated,))
 def profile_handler(request: HttpRequest) -> Response:
-    user = request.user
-
     try:
-        profile = user.profile
-    except AttributeError:
+        profile = Profile.objects.get(owner_id=request.user.id)
+    except Profile.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        serializer = ProfileSerializer(profile, many=False)
-        return Response(serializer.data)
+        validators = object_validators(request, profile)
+        if response := not_modified(request, *validators):
+            return response
+        context = {'include_token': token_requested(request)}
+        serializer = ProfileSerializer(profile, many=False, context=context)
+        return with_validators(Response(serializer.data), *validators)
 
     if request.method == 'PUT':
-        serializer = ProfileSerializer(profile, data=request.data, many=False)
+        context = {'include_token': token_requested(request)}
+        serializer = ProfileSerializer(profile, data=request.data, many=False, context=context)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
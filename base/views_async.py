@@ -0,0 +1,288 @@
+from functools import wraps
+from uuid import UUID
+from django.db.models import Q
+from django.http import HttpResponse
+from django.http.request import HttpRequest
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from rest_framework.pagination import _positive_int
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from . import events
+from .aorm import aexists, aget, alist, arun
+from .authentication import get_authentication
+from .conditional import collection_validators, not_modified, object_validators, with_validators
+from .metrics import RENDER, timing
+from .models import Note, Category, Profile
+from .renderers import json_dumps
+from .rows import query_row_serializer
+from .search import search_notes
+from .serializers import (NoteSerializer,
+                          NoteSearchSerializer,
+                          CategorySerializer,
+                          CategoryStatsSerializer,
+                          ProfileSerializer)
+from .tokens import INCLUDE_TOKEN_QUERY_PARAM
+
+# Async variants of the note, category and profile endpoints. Reads await the
+# ORM and serialize on the event loop; writes run the serializer and its
+# signal handlers as a single executor call. Registration, login, token
+# refresh, bulk writes and sync stay on the synchronous views. Lists here have
+# no response cache, no cursor pagination and no `?stream=`.
+DEFAULT_LIMIT = 15
+MAX_LIMIT = 100
+
+
+def respond(data=None, status_code: int = status.HTTP_200_OK) -> HttpResponse:
+    if data is None:
+        return HttpResponse(status=status_code)
+    with timing(RENDER):
+        content = json_dumps(data)
+    return HttpResponse(content, status=status_code, content_type='application/json')
+
+
+def async_api_view(methods, authenticated: bool = True):
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method not in methods:
+                response = respond({'detail': f'Method "{request.method}" not allowed.'},
+                                   status.HTTP_405_METHOD_NOT_ALLOWED)
+                response.headers['Allow'] = ', '.join(methods)
+                return response
+
+            if authenticated:
+                try:
+                    user = await get_authentication().aauthenticate(request)
+                except (AuthenticationFailed, InvalidToken) as exc:
+                    return respond(exc.detail, status.HTTP_401_UNAUTHORIZED)
+                if user is None:
+                    return respond({'detail': 'Authentication credentials were not provided.'},
+                                   status.HTTP_401_UNAUTHORIZED)
+                request.user = user
+
+            request.data = {}
+            if request.method in ('POST', 'PUT') and request.body:
+                # The same negotiated parsers as the DRF views (JSON, forms,
+                # MessagePack), reading the body already loaded above.
+                parsers = [parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]
+                try:
+                    request.data = Request(request, parsers=parsers).data
+                except APIException as exc:
+                    return respond(exc.detail, exc.status_code)
+
+            return await view(request, *args, **kwargs)
+
+        # Token auth, so no CSRF; csrf_exempt() would hide the coroutine from Django.
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+def _page_param(request: HttpRequest, name: str, default: int, cutoff: int = None) -> int:
+    try:
+        return _positive_int(request.GET[name], strict=name == 'limit', cutoff=cutoff)
+    except (KeyError, ValueError):
+        return default
+
+
+async def list_response(request: HttpRequest, queryset, serializer_class) -> HttpResponse:
+    # Unpaged by default like the function-based views; `limit`/`offset`
+    # page without a count query, fetching one extra row to detect a next page.
+    try:
+        serializer_class = query_row_serializer(request.GET, serializer_class)
+    except serializers.ValidationError as exc:
+        return respond(exc.detail, status.HTTP_400_BAD_REQUEST)
+    queryset = serializer_class.values(queryset)
+    if 'limit' not in request.GET and 'offset' not in request.GET:
+        serializer = serializer_class(await alist(queryset), many=True)
+        return respond(serializer.data)
+
+    limit = _page_param(request, 'limit', DEFAULT_LIMIT, MAX_LIMIT)
+    offset = _page_param(request, 'offset', 0)
+    rows = await alist(queryset[offset:offset + limit + 1])
+
+    url = request.build_absolute_uri()
+    next_url = previous_url = None
+    if len(rows) > limit:
+        next_url = replace_query_param(replace_query_param(url, 'limit', limit), 'offset', offset + limit)
+    if offset > 0:
+        previous_url = replace_query_param(url, 'limit', limit)
+        previous_url = replace_query_param(previous_url, 'offset', offset - limit) \
+            if offset > limit else remove_query_param(previous_url, 'offset')
+
+    serializer = serializer_class(rows[:limit], many=True)
+    return respond({'next': next_url, 'previous': previous_url, 'results': serializer.data})
+
+
+async def save_response(serializer, status_code: int = status.HTTP_200_OK, error_status: int | None = None,
+                        **save_kwargs) -> HttpResponse:
+    def save():
+        if not serializer.is_valid():
+            return None
+        serializer.save(**save_kwargs)
+        return serializer.data
+
+    if (data := await arun(save)) is not None:
+        return respond(data, status_code)
+    return respond(serializer.errors, error_status or status.HTTP_400_BAD_REQUEST)
+
+
+@async_api_view(('GET',), authenticated=False)
+async def get_routes(request: HttpRequest) -> HttpResponse:
+    routes = {
+        'routes': '/note_app/api',
+        'register': '/note_app/api/users',
+        'login': '/note_app/api/token/login',
+        'login_refresh': '/note_app/api/token/login/refresh',
+        'profile': '/note_app/api/profile',
+        'the user\'s all notes': '/note_app/api/notes',
+        'the user\'s notes in bulk': '/note_app/api/notes/bulk',
+        'the user\'s single note': '/note_app/api/notes/<uuid:note_id>',
+        'the user\'s all categories': '/note_app/api/categories',
+        'the user\'s single category': '/note_app/api/categories/<uuid:category_id>',
+        'the user\'s single category\'s notes': '/note_app/api/categories/<uuid:category_id>/notes',
+        'the user\'s changes since a watermark': '/note_app/api/sync?since=<watermark>',
+        'the user\'s change events (long-poll)': '/note_app/api/events?after=<event_id>',
+    }
+
+    return respond(routes)
+
+
+@async_api_view(('GET', 'POST'))
+async def note_list(request: HttpRequest) -> HttpResponse:
+    notes = Note.objects.filter(owner_id=request.user.id)
+
+    if request.method == 'GET':
+        validators = await arun(collection_validators, request, request.user.id, Note)
+        if response := not_modified(request, *validators):
+            return response
+
+        serializer_class = NoteSerializer
+        if search := request.GET.get('search'):
+            # Probing for the FTS table may touch the database once.
+            notes = await arun(search_notes, notes, search, request.user.id)
+            serializer_class = NoteSearchSerializer
+        if pin := request.GET.get('pin'):
+            notes = notes.filter(
+                    Q(is_pinned__exact=pin.capitalize())
+            )
+        return with_validators(await list_response(request, notes, serializer_class), *validators)
+
+    serializer = NoteSerializer(data=request.data, many=False, context={'request': request})
+    return await save_response(serializer, status.HTTP_201_CREATED, owner_id=request.user.id)
+
+
+@async_api_view(('GET', 'PUT', 'DELETE'))
+async def single_note(request: HttpRequest, note_id: UUID) -> HttpResponse:
+    try:
+        note = await aget(Note.objects.all(), pk=note_id, owner_id=request.user.id)
+    except Note.DoesNotExist:
+        return respond(status_code=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'GET':
+        validators = object_validators(request, note)
+        if response := not_modified(request, *validators):
+            return response
+        serializer = NoteSerializer(note, many=False)
+        return with_validators(respond(serializer.data), *validators)
+
+    if request.method == 'PUT':
+        serializer = NoteSerializer(note, data=request.data, many=False, context={'request': request})
+        return await save_response(serializer, error_status=status.HTTP_404_NOT_FOUND)
+
+    await arun(note.delete)
+    return respond(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@async_api_view(('GET', 'POST'))
+async def category_list(request: HttpRequest) -> HttpResponse:
+    categories = Category.objects.filter(owner_id=request.user.id)
+
+    if request.method == 'GET':
+        validators = await arun(collection_validators, request, request.user.id, Category, Note)
+        if response := not_modified(request, *validators):
+            return response
+
+        if name := request.GET.get('name'):
+            categories = categories.filter(
+                    Q(name__icontains=name)
+            )
+        categories = categories.with_note_stats()
+        return with_validators(await list_response(request, categories, CategoryStatsSerializer), *validators)
+
+    serializer = CategorySerializer(data=request.data, many=False)
+    return await save_response(serializer, status.HTTP_201_CREATED, owner_id=request.user.id)
+
+
+@async_api_view(('GET', 'PUT', 'DELETE'))
+async def single_category(request: HttpRequest, category_id: UUID) -> HttpResponse:
+    try:
+        category = await aget(Category.objects.all(), pk=category_id, owner_id=request.user.id)
+    except Category.DoesNotExist:
+        return respond(status_code=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'GET':
+        validators = object_validators(request, category)
+        if response := not_modified(request, *validators):
+            return response
+        serializer = CategorySerializer(category, many=False)
+        return with_validators(respond(serializer.data), *validators)
+
+    if request.method == 'PUT':
+        serializer = CategorySerializer(category, data=request.data, many=False)
+        return await save_response(serializer)
+
+    await arun(category.delete)
+    return respond(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@async_api_view(('GET',))
+async def category_notes(request: HttpRequest, category_id: UUID) -> HttpResponse:
+    if not await aexists(Category.objects.filter(pk=category_id, owner_id=request.user.id)):
+        return respond(status_code=status.HTTP_404_NOT_FOUND)
+
+    validators = await arun(collection_validators, request, request.user.id, Note)
+    if response := not_modified(request, *validators):
+        return response
+
+    notes = Note.objects.filter(category_id=category_id, owner_id=request.user.id)
+    return with_validators(await list_response(request, notes, NoteSerializer), *validators)
+
+
+@async_api_view(('GET', 'PUT', 'DELETE'))
+async def profile_handler(request: HttpRequest) -> HttpResponse:
+    try:
+        profile = await aget(Profile.objects.all(), owner_id=request.user.id)
+    except Profile.DoesNotExist:
+        return respond(status_code=status.HTTP_404_NOT_FOUND)
+
+    context = {'include_token': request.GET.get(INCLUDE_TOKEN_QUERY_PARAM, '').lower() in ('1', 'true', 'yes')}
+    if request.method == 'GET':
+        validators = object_validators(request, profile)
+        if response := not_modified(request, *validators):
+            return response
+        serializer = ProfileSerializer(profile, many=False, context=context)
+        # A requested token may come from (or go to) the cache.
+        data = await arun(lambda: serializer.data) if context['include_token'] else serializer.data
+        return with_validators(respond(data), *validators)
+
+    if request.method == 'PUT':
+        serializer = ProfileSerializer(profile, data=request.data, many=False, context=context)
+        return await save_response(serializer)
+
+    await arun(profile.delete)
+    return respond(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@async_api_view(('GET',))
+async def note_events(request: HttpRequest) -> HttpResponse:
+    # Waiting clients cost a suspended coroutine, not a thread.
+    try:
+        after, timeout = events.parse_poll(request.GET)
+    except serializers.ValidationError as exc:
+        return respond(exc.detail, status.HTTP_400_BAD_REQUEST)
+    return respond(await events.apoll(request.user.id, after, timeout))
@@ -5,79 +5,155 @@ from django.db import IntegrityError
 from rest_framework import status, renderers
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from .search import search_notes
 from .serializers import (NoteSerializer,
+                          NoteSearchSerializer,
                           CategorySerializer,
+                          CategoryStatsSerializer,
                           ProfileSerializer,
                           UserSerializer,
                           MyTokenObtainPairSerializer)
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.viewsets import ModelViewSet, ViewSet
 from rest_framework.permissions import IsAuthenticated
+from . import bulk, events, sync
+from .caching import NOTES, CATEGORIES, CachedListMixin
+from .conditional import ConditionalGetMixin, collection_validators, not_modified, with_validators
 from .models import Note, Category, Profile
 from django.db.models import Q
-from .pagination import StandardResultsSetPagination
+from django.http import Http404
+from .pagination import SwitchableResultsSetPagination
+from .renderers import FastJSONRenderer
+from .rows import RowListMixin, request_row_serializer
+from .tokens import token_requested
 
 # Create your views here.
 User = get_user_model()
 
 
-class NotesViewSet(ModelViewSet):
+# Same shape as Django's <uuid:...> converter, so malformed ids never reach the database.
+UUID_LOOKUP_REGEX = '[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+
+
+class NotesViewSet(CachedListMixin, ConditionalGetMixin, RowListMixin, ModelViewSet):
     serializer_class = NoteSerializer
+    validator_models = (Note,)
+    cache_scopes = (NOTES,)
+    lookup_value_regex = UUID_LOOKUP_REGEX
     permission_classes = (IsAuthenticated,)
-    pagination_class = StandardResultsSetPagination
+    pagination_class = SwitchableResultsSetPagination
 
     def get_queryset(self):
         if params := self.request.query_params:
             if keyword := params.get('keyword', default=None):
-                return Note.objects.filter(owner=self.request.user).filter(
-                        Q(title__icontains=keyword)
-                        | Q(body__icontains=keyword)
-                )
+                return search_notes(Note.objects.filter(owner_id=self.request.user.id), keyword, self.request.user.id)
             if pin := params.get('pin', default=None):
                 try:
-                    return Note.objects.filter(owner=self.request.user).filter(
+                    return Note.objects.filter(owner_id=self.request.user.id).filter(
                             is_pinned__exact=pin.capitalize()
                     )
                 except ValidationError:
                     return []
 
-        return Note.objects.filter(owner=self.request.user)
+        return Note.objects.filter(owner_id=self.request.user.id)
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.request.query_params.get('keyword'):
+            return NoteSearchSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        serializer.save(owner_id=self.request.user.id)
+
+    @action(detail=False, methods=('post',), url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        return Response(bulk.apply(request.user.id, request.data))
 
 
-class CategoriesViewSet(ModelViewSet):
+class CategoriesViewSet(CachedListMixin, ConditionalGetMixin, RowListMixin, ModelViewSet):
     serializer_class = CategorySerializer
+    # Listed categories carry note counts, so notes are part of their state.
+    validator_models = (Category, Note)
+    cache_scopes = (CATEGORIES, NOTES)
+    lookup_value_regex = UUID_LOOKUP_REGEX
     permission_classes = (IsAuthenticated,)
-    pagination_class = StandardResultsSetPagination
+    pagination_class = SwitchableResultsSetPagination
 
-    @action(detail=True, renderer_classes=[renderers.JSONRenderer, renderers.BrowsableAPIRenderer])
+    @action(detail=True, renderer_classes=[FastJSONRenderer, renderers.BrowsableAPIRenderer])
     def notes(self, request, *args, **kwargs):
-        notes = self.get_object().note_set.all()
-        serializer = NoteSerializer(notes, many=True)
-        return Response(serializer.data)
+        category_id = kwargs[self.lookup_field]
+        if not self.get_queryset().filter(pk=category_id).exists():
+            raise Http404
+
+        validators = collection_validators(request, request.user.id, Note)
+        if response := not_modified(request, *validators):
+            return response
+
+        serializer_class = request_row_serializer(request, NoteSerializer)
+        notes = serializer_class.values(Note.objects.filter(category_id=category_id, owner_id=self.request.user.id))
+        page = self.paginate_queryset(notes)
+        if page is not None:
+            serializer = serializer_class(page, many=True)
+            return with_validators(self.get_paginated_response(serializer.data), *validators)
+
+        serializer = serializer_class(notes, many=True)
+        return with_validators(Response(serializer.data), *validators)
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        serializer.save(owner_id=self.request.user.id)
 
     def get_queryset(self):
+        categories = Category.objects.filter(owner_id=self.request.user.id)
+        if self.action == 'list':
+            categories = categories.with_note_stats()
         if params := self.request.query_params:
             if name := params.get('name', default=None):
-                return Category.objects.filter(owner=self.request.user).filter(
+                return categories.filter(
                         Q(name__icontains=name)
                 )
-        return Category.objects.filter(owner=self.request.user)
+        return categories
 
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CategoryStatsSerializer
+        return super().get_serializer_class()
 
-class ProfileViewSet(ModelViewSet):
+
+class SyncViewSet(ViewSet):
+    permission_classes = (IsAuthenticated,)
+
+    def list(self, request, *args, **kwargs):
+        since = sync.parse_since(request.query_params.get(sync.SINCE_QUERY_PARAM))
+        return Response(sync.changes_since(request.user.id, since))
+
+
+class EventsViewSet(ViewSet):
+    permission_classes = (IsAuthenticated,)
+
+    def list(self, request, *args, **kwargs):
+        after, timeout = events.parse_poll(request.query_params)
+        return Response(events.poll(request.user.id, after, timeout))
+
+    @action(detail=False, renderer_classes=[FastJSONRenderer, events.EventStreamRenderer])
+    def stream(self, request, *args, **kwargs):
+        return events.stream_response(request)
+
+
+class ProfileViewSet(ConditionalGetMixin, ModelViewSet):
     serializer_class = ProfileSerializer
+    validator_models = (Profile,)
+    lookup_value_regex = UUID_LOOKUP_REGEX
     permission_classes = (IsAuthenticated,)
     queryset = Profile.objects.all()
     http_method_names = ('get', 'head', 'options', 'put', 'delete', 'patch')
 
     def get_queryset(self):
-        return Profile.objects.filter(owner=self.request.user)
+        return Profile.objects.filter(owner_id=self.request.user.id)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_token'] = token_requested(self.request)
+        return context
 
 
 class UserViewSet(ModelViewSet):
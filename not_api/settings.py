@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 
 from pathlib import Path
 from os import getenv
+from importlib.util import find_spec
 from dotenv import load_dotenv
 from datetime import timedelta
 
@@ -31,10 +32,17 @@ DEBUG = True if getenv('DEBUG') == 'True' else False
 
 ALLOWED_HOSTS = [getenv('ALLOWED_ONE'), getenv('ALLOWED_TWO')]
 AUTH_USER_MODEL = 'base.MyUser'
+
+# Admin site path: admin/ in DEBUG, otherwise ADMIN_ADDRESS (not served when
+# unset). The admin modules are only imported by not_api/urls.py when served.
+ADMIN_URL = 'admin/' if DEBUG else getenv('ADMIN_ADDRESS')
+# URL set served under note_app/: FUNC (default), CLASS or ASYNC.
+VIEW_BASED = getenv('VIEW_BASED', 'FUNC')
+
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -48,10 +56,36 @@ INSTALLED_APPS = [
     'base.apps.BaseConfig',
 ]
 
+# 'stateless' trusts the signed user_id claim instead of loading MyUser on
+# every request; 'database' restores simplejwt's per-request user lookup.
+JWT_AUTH_MODE = getenv('JWT_AUTH_MODE', 'stateless')
+# Seconds a user's is_active flag is cached in stateless mode (0 disables the check).
+JWT_ACTIVE_STATUS_TTL = int(getenv('JWT_ACTIVE_STATUS_TTL', '30'))
+
+# Seconds an access token minted for ?include_token=1 profile reads is reused.
+ACCESS_TOKEN_CACHE_TIMEOUT = int(getenv('ACCESS_TOKEN_CACHE_TIMEOUT', '3600'))
+
+# orjson-backed JSON when installed (falls back to DRF's encoder); MessagePack
+# is negotiated via `Accept: application/msgpack` when msgpack is installed.
+API_MSGPACK = getenv('API_MSGPACK', 'True') == 'True' and find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'base.authentication.StatelessJWTAuthentication'
+        if JWT_AUTH_MODE == 'stateless'
+        else 'base.authentication.DatabaseJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'base.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        *(['base.renderers.MessagePackRenderer'] if API_MSGPACK else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'base.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        *(['base.renderers.MessagePackParser'] if API_MSGPACK else []),
+    ],
 }
 
 SIMPLE_JWT = {
@@ -77,7 +111,7 @@ SIMPLE_JWT = {
 
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
-    'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
+    'TOKEN_USER_CLASS': 'base.authentication.ClaimUser',
 
     'JTI_CLAIM': 'jti',
 
@@ -87,7 +121,10 @@ SIMPLE_JWT = {
 }
 
 MIDDLEWARE = [
+    'base.middleware.MetricsMiddleware',
+    'base.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'base.middleware.replica_routing_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -120,13 +157,146 @@ WSGI_APPLICATION = 'not_api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
+# SQLite by default; DB_ENGINE=postgresql (needs psycopg2) reads the
+# connection from DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT. SQLite goes
+# through base.sqlite3, which opens write transactions with BEGIN IMMEDIATE.
+
+DB_ENGINE = getenv('DB_ENGINE', 'sqlite3')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': 'base.sqlite3' if DB_ENGINE == 'sqlite3' else f'django.db.backends.{DB_ENGINE}',
+        'NAME': getenv('DB_NAME') or BASE_DIR / 'db.sqlite3',
+        # Seconds a connection is kept open between requests (0 closes it per request).
+        'CONN_MAX_AGE': int(getenv('DB_CONN_MAX_AGE', '60')),
+        # Reused connections are checked before each request (base.signals
+        # does this on Django < 4.1).
+        'CONN_HEALTH_CHECKS': getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+    }
+}
+
+if DB_ENGINE != 'sqlite3':
+    DATABASES['default'].update({
+        'USER': getenv('DB_USER', ''),
+        'PASSWORD': getenv('DB_PASSWORD', ''),
+        'HOST': getenv('DB_HOST', ''),
+        'PORT': getenv('DB_PORT', ''),
+    })
+    if DB_ENGINE == 'postgresql':
+        DATABASES['default']['OPTIONS'] = {
+            'connect_timeout': int(getenv('DB_CONNECT_TIMEOUT', '5')),
+        }
+
+# Read replicas: DB_REPLICAS lists replica SQLite files, or replica hosts that
+# share the primary's name and credentials. Safe-method reads are routed to
+# them; a client that wrote keeps reading from the primary for
+# REPLICA_STICKY_SECONDS so it sees its own changes. Replicas must be
+# physical copies of the primary (streaming replication, or SQLite files
+# copied from it, FTS5 tables included): `migrate` never runs on them.
+
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, getenv('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME' if DB_ENGINE == 'sqlite3' else 'HOST': replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['base.routers.ReplicaRouter'] if DATABASE_REPLICAS else []
+REPLICA_STICKY_SECONDS = int(getenv('REPLICA_STICKY_SECONDS', '5'))
+
+# Applied to every new SQLite connection: WAL lets readers run alongside the
+# writer, NORMAL sync is durable in WAL mode, and writers wait for the lock
+# (milliseconds) instead of failing with `database is locked`. The wait only
+# covers transactions that take the lock when they begin, hence base.sqlite3.
+SQLITE_PRAGMAS = {
+    'journal_mode': getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(getenv('SQLITE_BUSY_TIMEOUT', '5000')),
+    'mmap_size': int(getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'temp_store': 'MEMORY',
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+# Local memory by default (per process); set CACHE_BACKEND/CACHE_LOCATION for a file or
+# memcached backend shared between workers.
+
+CACHE_BACKEND = getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': getenv('CACHE_LOCATION', 'not-api'),
     }
 }
 
+if CACHE_BACKEND.endswith(('LocMemCache', 'FileBasedCache')):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(getenv('CACHE_MAX_ENTRIES', '10000')),
+    }
+
+# Seconds list responses stay in the per-user response cache (0 disables it).
+# Writes invalidate it through counters in the cache, so it needs a backend
+# shared by all workers (memcached, redis, file); with the per-process
+# LocMemCache it stays off unless RESPONSE_CACHE_SINGLE_PROCESS=True
+# promises a single worker process (runserver, one gunicorn worker).
+RESPONSE_CACHE_TIMEOUT = int(getenv('RESPONSE_CACHE_TIMEOUT', '300'))
+RESPONSE_CACHE_SINGLE_PROCESS = getenv('RESPONSE_CACHE_SINGLE_PROCESS', 'False') == 'True'
+
+# Request metrics: Server-Timing headers and per-route histograms scraped
+# from /metrics (open in DEBUG, otherwise with `Authorization: Bearer
+# METRICS_TOKEN`). A request running one SQL shape METRICS_N_PLUS_ONE_THRESHOLD
+# or more times is logged as a possible N+1.
+METRICS = getenv('METRICS', 'True') == 'True'
+METRICS_TOKEN = getenv('METRICS_TOKEN', '')
+METRICS_N_PLUS_ONE_THRESHOLD = int(getenv('METRICS_N_PLUS_ONE_THRESHOLD', '5'))
+
+# Profiling: requests to PROFILE_PATHS run under cProfile when an admin sends
+# `X-Profile: 1` or they are sampled by PROFILE_SAMPLE_RATE (0-1). The last
+# PROFILE_KEEP stats files are kept in PROFILE_DIR and served to admins at
+# /profiles. Queries slower than SLOW_QUERY_MS (0, the default, disables it)
+# are logged and listed at /profiles/slow-queries; SLOW_QUERY_EXPLAIN adds
+# their query plan, at the cost of running an EXPLAIN for each of them.
+PROFILE_PATHS = getenv('PROFILE_PATHS', r'/api/(notes|categories)')
+PROFILE_SAMPLE_RATE = float(getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = Path(getenv('PROFILE_DIR', BASE_DIR / 'profiles'))
+PROFILE_KEEP = int(getenv('PROFILE_KEEP', '50'))
+SLOW_QUERY_MS = int(getenv('SLOW_QUERY_MS', '0'))
+SLOW_QUERY_EXPLAIN = getenv('SLOW_QUERY_EXPLAIN', 'False') == 'True'
+SLOW_QUERY_LOG_SIZE = int(getenv('SLOW_QUERY_LOG_SIZE', '100'))
+
+# Change feed (api/events). The default broker fans out within one process;
+# multi-worker deployments point EVENT_BROKER at a broker on a shared bus.
+
+EVENT_BROKER = getenv('EVENT_BROKER', 'base.events.LocalBroker')
+# Events kept per user for clients resuming with ?after= / Last-Event-ID.
+EVENT_BACKLOG = int(getenv('EVENT_BACKLOG', '100'))
+EVENT_POLL_TIMEOUT = int(getenv('EVENT_POLL_TIMEOUT', '25'))
+EVENT_HEARTBEAT = int(getenv('EVENT_HEARTBEAT', '15'))
+EVENT_STREAM_MAX_AGE = int(getenv('EVENT_STREAM_MAX_AGE', '300'))
+
+# Password hashing
+# https://docs.djangoproject.com/en/4.0/topics/auth/passwords/
+# Our PBKDF2 hasher replaces Django's (same algorithm name), so existing
+# hashes keep verifying and are upgraded to PASSWORD_HASH_ITERATIONS on login.
+
+PASSWORD_HASH_ITERATIONS = int(getenv('PASSWORD_HASH_ITERATIONS', '320000'))
+
+PASSWORD_HASHERS = [
+    'base.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+AUTHENTICATION_BACKENDS = [
+    'base.backends.ProfileModelBackend',
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
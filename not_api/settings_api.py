@@ -0,0 +1,42 @@
+"""
+API-only settings for not_api.
+
+Select with DJANGO_SETTINGS_MODULE=not_api.settings_api. The API is
+authenticated by JWT alone, so unless ADMIN_ADDRESS is set the admin and the
+session, messages, CSRF, template and static files stacks it needs are left
+out, along with the browsable API renderer. `manage.py measure_startup`
+compares the boot time with the default settings.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK, getenv
+
+# No DEBUG default here: the admin is served only when asked for.
+ADMIN_URL = getenv('ADMIN_ADDRESS')
+
+ADMIN_APPS = (
+    'django.contrib.admin.apps.SimpleAdminConfig',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+)
+ADMIN_MIDDLEWARE = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)
+
+if not ADMIN_URL:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ADMIN_APPS]
+    MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in ADMIN_MIDDLEWARE]
+    TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+    ],
+}
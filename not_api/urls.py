@@ -1,16 +1,28 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
-from os import getenv
-from dotenv import load_dotenv
+from base import metrics, profiling
 
-load_dotenv()
-
-admin_url = 'admin/' if getenv("DEBUG") == "True" else getenv('ADMIN_ADDRESS')
+view_urls = {
+    'CLASS': ('base.urls_cls', 'class_based'),
+    'ASYNC': ('base.urls_async', 'async_based'),
+}
+view_module, view_namespace = view_urls.get(settings.VIEW_BASED, ('base.urls', 'func_based'))
 
 urlpatterns = [
-    path(admin_url, admin.site.urls),
     # path('api-auth/', include('rest_framework.urls')),
-    path('note_app/', include(('base.urls_cls', 'base'), namespace='class_based')) \
-        if getenv('VIEW_BASED') == 'CLASS' \
-        else path('note_app/', include(('base.urls', 'base'), namespace='func_based')),
+    path('note_app/', include((view_module, 'base'), namespace=view_namespace)),
+    path('profiles', profiling.profile_list, name='profiles'),
+    path('profiles/slow-queries', profiling.slow_query_list, name='slow_queries'),
+    path('profiles/<slug:profile_id>', profiling.profile_download, name='profile'),
 ]
+
+if settings.METRICS:
+    urlpatterns.append(path('metrics', metrics.scrape, name='metrics'))
+
+# SimpleAdminConfig skips autodiscovery, so the admin and base/admin.py are
+# only imported when the admin is actually served.
+if settings.ADMIN_URL:
+    from django.contrib import admin
+
+    admin.autodiscover()
+    urlpatterns.insert(0, path(settings.ADMIN_URL, admin.site.urls))